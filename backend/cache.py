@@ -0,0 +1,91 @@
+"""Content-addressed cache for generated MCQ sets.
+
+Entries are keyed on a hash of the document text, the model, the number of
+questions and the prompt version. A small in-process LRU sits in front of
+the persistent `mcq_cache` table in SQLite (see db.py).
+"""
+
+import os
+import time
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    from . import db
+    from . import metrics
+except Exception:
+    import db
+    import metrics
+
+# In-process LRU size (entries), persistent cache size (bytes) and entry age limit (seconds)
+MCQ_CACHE_LRU_SIZE = int(os.getenv("MCQ_CACHE_LRU_SIZE", "256"))
+MCQ_CACHE_MAX_BYTES = int(os.getenv("MCQ_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MCQ_CACHE_TTL_SECONDS = float(os.getenv("MCQ_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# key -> (stored_at, mcqs)
+_lru: "OrderedDict[str, Any]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "lru_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def make_key(text: str, model: str, num_questions: int, prompt_version: str) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+    return hashlib.sha256(f"{text_hash}:{model}:{num_questions}:{prompt_version}".encode()).hexdigest()
+
+
+def _lru_put(key: str, stored_at: float, mcqs: List[Dict[str, Any]]) -> None:
+    with _lock:
+        _lru[key] = (stored_at, mcqs)
+        _lru.move_to_end(key)
+        while len(_lru) > MCQ_CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def get(key: str) -> Optional[List[Dict[str, Any]]]:
+    now = time.time()
+    with _lock:
+        entry = _lru.get(key)
+        if entry is not None:
+            if now - entry[0] <= MCQ_CACHE_TTL_SECONDS:
+                _lru.move_to_end(key)
+                _stats["hits"] += 1
+                _stats["lru_hits"] += 1
+                metrics.CACHE_LOOKUPS.inc("memory_hit")
+                return entry[1]
+            del _lru[key]
+    row = db.cache_get(key, max_age_seconds=MCQ_CACHE_TTL_SECONDS)
+    with _lock:
+        _stats["hits" if row is not None else "misses"] += 1
+    metrics.CACHE_LOOKUPS.inc("db_hit" if row is not None else "miss")
+    if row is None:
+        return None
+    mcqs, created_at = row
+    _lru_put(key, datetime.datetime.fromisoformat(created_at).timestamp(), mcqs)
+    return mcqs
+
+
+def put(key: str, mcqs: List[Dict[str, Any]]) -> None:
+    _lru_put(key, time.time(), mcqs)
+    db.cache_put(key, mcqs)
+    removed = db.cache_evict(MCQ_CACHE_MAX_BYTES, MCQ_CACHE_TTL_SECONDS)
+    with _lock:
+        _stats["stores"] += 1
+        _stats["evictions"] += removed
+
+
+def clear_memory() -> None:
+    """Drop the in-process LRU (the persistent table is left untouched)."""
+    with _lock:
+        _lru.clear()
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_stats)
+        out["lru_size"] = len(_lru)
+    lookups = out["hits"] + out["misses"]
+    out["hit_ratio"] = (out["hits"] / lookups) if lookups else 0.0
+    return out
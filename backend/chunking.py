@@ -0,0 +1,126 @@
+"""Split large documents into token-budgeted chunks and merge per-chunk MCQs.
+
+Used by the map-reduce generation path in main.py: each chunk gets its own
+LLM call, and the merged result spreads questions across the document.
+"""
+
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    from . import dedup
+except Exception:
+    import dedup
+
+# Rough average for English text with GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _paragraphs(text: str) -> List[str]:
+    parts = re.split(r"\n\s*\n", text)
+    if len(parts) == 1:
+        # no blank lines (e.g. PDF text joined per line): fall back to lines
+        parts = text.split("\n")
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _split_oversized(paragraph: str, max_chars: int) -> List[str]:
+    """Split one paragraph that alone exceeds the budget, at sentence ends if possible."""
+    pieces: List[str] = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Pack paragraphs, in order, into chunks of at most `max_tokens` (estimated)."""
+    max_chars = max(max_tokens, 1) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for para in _paragraphs(text):
+        for piece in ([para] if len(para) <= max_chars else _split_oversized(para, max_chars)):
+            if current and size + 2 + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + (2 if size else 0)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def pack_spans(text: str, spans: Sequence[Tuple[int, int, int]], max_tokens: int) -> List[str]:
+    """Like `split_into_chunks`, from precomputed (start, end, tokens) paragraph spans.
+
+    Budgets by the stored token counts, so the text is only sliced, not re-split.
+    """
+    max_tokens = max(max_tokens, 1)
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for start, end, tokens in spans:
+        para = text[start:end]
+        pieces = [(para, tokens)] if tokens <= max_tokens else [
+            (p, estimate_tokens(p)) for p in _split_oversized(para, max_tokens * CHARS_PER_TOKEN)
+        ]
+        for piece, piece_tokens in pieces:
+            if current and size + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def spread(items: List[Any], k: int) -> List[Any]:
+    """Pick at most `k` items evenly spaced across `items`, keeping their order."""
+    if k <= 0:
+        return []
+    if len(items) <= k:
+        return list(items)
+    step = len(items) / k
+    return [items[int(i * step)] for i in range(k)]
+
+
+def merge_mcqs(per_chunk: List[List[Dict[str, Any]]], n: int, deduper: "dedup.Deduper | None" = None) -> List[Dict[str, Any]]:
+    """Merge per-chunk MCQ lists (in document order) into at most `n` questions.
+
+    Questions are taken round-robin across chunks so the result covers the
+    whole document, and near-duplicates of questions already taken (see
+    dedup.py) are skipped in favour of the next candidate. Pass `deduper` to
+    also skip questions accepted earlier.
+    """
+    merged: List[Dict[str, Any]] = []
+    deduper = deduper if deduper is not None else dedup.Deduper()
+    depth = max((len(items) for items in per_chunk), default=0)
+    for i in range(depth):
+        for items in per_chunk:
+            if len(merged) >= n:
+                return merged
+            if i >= len(items):
+                continue
+            if deduper.add(items[i].get("question", "")):
+                merged.append(items[i])
+    return merged
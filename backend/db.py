@@ -1,19 +1,84 @@
 import os
+import re
+import json
+import base64
+import hashlib
 import sqlite3
+import zlib
+import weakref
 import threading
 import datetime
+from contextlib import contextmanager
+
+try:
+    from . import metrics
+except Exception:
+    import metrics
 
 BASE_DIR = os.path.dirname(__file__)
 # Allow overriding DB location for tests or deployments
 DB_PATH = os.getenv("QUIZGEN_DB_PATH", os.path.join(BASE_DIR, "storage", "quizgen.db"))
 _lock = threading.Lock()
 
+# Connection tuning, applied to every pooled connection. WAL lets readers run
+# alongside a writer; synchronous=NORMAL is durable across app crashes in WAL
+# mode and only risks the last commits on power loss.
+_BUSY_TIMEOUT_MS = int(os.getenv("QUIZGEN_DB_BUSY_TIMEOUT_MS", "5000"))
+_CACHE_SIZE_KB = int(os.getenv("QUIZGEN_DB_CACHE_SIZE_KB", "16384"))
+_MMAP_SIZE = int(os.getenv("QUIZGEN_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# per-thread connections (see get_conn), tracked weakly so close_all() can
+# close them while connections of finished threads are still freed
+_local = threading.local()
+_all_conns: "weakref.WeakSet[_Connection]" = weakref.WeakSet()
+_pool_lock = threading.Lock()
+# bumped by close_all() so threads notice their connection was closed
+_generation = 0
+# DB_PATH whose schema init_db() has set up; the first connection runs it
+_initialized_path: str | None = None
+
+
+def _timed(fn):
+    """Record the call's latency in the quizgen_db_call_seconds histogram."""
+    return metrics.timed(metrics.DB_CALL_SECONDS, fn.__name__)(fn)
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection subclass; unlike the base class it supports weak references."""
+
+
+def _configure(conn) -> None:
+    conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # negative cache_size is in KiB
+    conn.execute(f"PRAGMA cache_size=-{_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+def _ensure_column(cur, table: str, column: str, decl: str) -> None:
+    """Add `column` to `table` if an older database does not have it yet."""
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in [r[1] for r in cur.fetchall()]:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
 
 def init_db() -> None:
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    """Create or migrate the schema. Runs once per DB_PATH: from the app's
+    lifespan hook, or otherwise on the first connection (see get_conn)."""
+    global _initialized_path
     with _lock:
-        conn = sqlite3.connect(DB_PATH)
+        if _initialized_path == DB_PATH:
+            return
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=_BUSY_TIMEOUT_MS / 1000.0)
+        # journal_mode=WAL is persistent, so set it once while creating the schema
+        _configure(conn)
         cur = conn.cursor()
+        # Several worker processes may start at once: take the write lock up
+        # front so their column checks and ALTERs do not interleave
+        cur.execute("BEGIN IMMEDIATE")
         cur.execute(
             """
         CREATE TABLE IF NOT EXISTS documents (
@@ -26,35 +91,247 @@ def init_db() -> None:
         )
         """
         )
+        _ensure_column(cur, "documents", "content_hash", "TEXT")
+        _ensure_column(cur, "documents", "body_id", "TEXT")
+        # Document bodies live here, zlib-compressed, keyed by the upload's
+        # content hash (so deduplicated uploads share one body) or the doc id.
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS document_bodies (
+            id TEXT PRIMARY KEY,
+            body BLOB,
+            size INTEGER
+        )
+        """
+        )
+        # JSON list of the character offset where each page starts
+        _ensure_column(cur, "document_bodies", "page_offsets", "TEXT")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)")
+        # Covering index for the newest-first listing: pages are read straight
+        # from the index in order, without sorting or touching table rows.
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_listing ON documents "
+            "(uploaded_at DESC, id DESC, filename, upload_path, extracted_path)"
+        )
+        # Full-text index over filename and text. Contentless (content=''):
+        # it stores only the index, rowids point at documents.rowid. documents
+        # has no INTEGER PRIMARY KEY, so VACUUM may renumber its rowids and
+        # must never be run on this database.
+        cur.execute("SELECT 1 FROM sqlite_master WHERE name='documents_fts'")
+        fts_exists = cur.fetchone() is not None
+        cur.execute("CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(filename, text, content='')")
+        if not fts_exists:
+            # migration: index documents stored before the FTS table existed
+            cur.execute("INSERT INTO documents_fts (rowid, filename, text) SELECT rowid, filename, coalesce(text, '') FROM documents")
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            doc_id TEXT,
+            num_questions INTEGER,
+            status TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+        """
+        )
+        # API key the job was queued by, so its LLM calls are charged to it
+        _ensure_column(cur, "jobs", "tenant", "TEXT")
+        # times the job has been claimed by a worker
+        _ensure_column(cur, "jobs", "attempts", "INTEGER NOT NULL DEFAULT 0")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS mcq_cache (
+            key TEXT PRIMARY KEY,
+            mcqs TEXT,
+            size INTEGER,
+            created_at TEXT,
+            last_used_at TEXT
+        )
+        """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_mcq_cache_last_used ON mcq_cache (last_used_at)")
+        # Token buckets shared by every process using this database (see
+        # ratelimit.SQLiteLimiter); `updated` is a unix timestamp.
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL,
+            updated REAL,
+            allowed INTEGER
+        ) WITHOUT ROWID
+        """
+        )
+        # Page/paragraph/sentence spans of each body (see segmentation.py),
+        # with their estimated token counts. Keyed by body, not document, so
+        # deduplicated uploads share them.
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS segments (
+            body_id TEXT,
+            kind TEXT,
+            start INTEGER,
+            end INTEGER,
+            tokens INTEGER,
+            page INTEGER,
+            PRIMARY KEY (body_id, kind, start)
+        ) WITHOUT ROWID
+        """
+        )
+        # How far segmentation of a body got: pages before next_page are done
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS segment_progress (
+            body_id TEXT PRIMARY KEY,
+            version INTEGER,
+            next_page INTEGER,
+            complete INTEGER
+        )
+        """
+        )
+        # Question bank: every validated MCQ generated for a document, once
+        # per (normalized) question text
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY,
+            doc_id TEXT,
+            qhash TEXT,
+            question TEXT,
+            options TEXT,
+            answer_index INTEGER,
+            created_at TEXT,
+            UNIQUE (doc_id, qhash)
+        )
+        """
+        )
+        _migrate_text_to_bodies(cur)
         conn.commit()
         conn.close()
+        _initialized_path = DB_PATH
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _decompress(body: bytes) -> str:
+    return zlib.decompress(body).decode("utf-8")
+
+
+def _migrate_text_to_bodies(cur) -> int:
+    """Move text stored inline in documents.text into document_bodies.
+
+    Returns the number of documents migrated.
+    """
+    cur.execute("SELECT id, content_hash, text FROM documents WHERE text IS NOT NULL")
+    rows = cur.fetchall()
+    for doc_id, content_hash, text in rows:
+        body_id = content_hash or doc_id
+        cur.execute(
+            "INSERT OR IGNORE INTO document_bodies (id, body, size) VALUES (?,?,?)",
+            (body_id, _compress(text), len(text)),
+        )
+        cur.execute("UPDATE documents SET body_id=?, text=NULL WHERE id=?", (body_id, doc_id))
+    return len(rows)
 
 
 def get_conn():
-    # allow cross-thread connections in uvicorn workers
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    """Return this thread's pooled connection to DB_PATH, opening it on first use.
+
+    Connections are kept per thread and reused across calls, so sqlite3's
+    per-connection statement cache is reused too; callers must not close them.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "key", None) != (DB_PATH, _generation):
+        if _initialized_path != DB_PATH:
+            init_db()
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=_BUSY_TIMEOUT_MS / 1000.0, cached_statements=256, factory=_Connection)
+        _configure(conn)
+        _local.conn = conn
+        _local.key = (DB_PATH, _generation)
+        with _pool_lock:
+            _all_conns.add(conn)
+    return conn
 
 
-def create_document(doc_id: str, filename: str, upload_path: str, extracted_path: str, text: str) -> None:
+@contextmanager
+def connection():
+    """Yield the pooled connection; commit on success, roll back on error."""
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO documents (id, filename, upload_path, extracted_path, text, uploaded_at) VALUES (?,?,?,?,?,?)",
-        (doc_id, filename, upload_path, extracted_path, text, datetime.datetime.now(datetime.timezone.utc).isoformat()),
-    )
-    conn.commit()
-    conn.close()
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    if conn.in_transaction:
+        conn.commit()
+
+
+def close_all() -> None:
+    """Close every pooled connection (e.g. at shutdown); threads reconnect on next use."""
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        conns = list(_all_conns)
+        _all_conns.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+@_timed
+def create_document(
+    doc_id: str,
+    filename: str,
+    upload_path: str,
+    extracted_path: str | None,
+    text: str,
+    content_hash: str | None = None,
+    page_offsets: list[int] | None = None,
+) -> None:
+    """Store document metadata and its text.
+
+    The text is kept compressed in document_bodies, shared between documents
+    with the same `content_hash`, and indexed for full-text search.
+    `page_offsets` (where each page starts in `text`) is kept with the body.
+    """
+    body_id = content_hash or doc_id
+    text = text or ""
+    with connection() as conn:
+        cur = conn.cursor()
+        if not cur.execute("SELECT 1 FROM document_bodies WHERE id=?", (body_id,)).fetchone():
+            # OR IGNORE: another process finishing the same upload may store
+            # the body between the check and the insert; its copy is the same
+            cur.execute(
+                "INSERT OR IGNORE INTO document_bodies (id, body, size, page_offsets) VALUES (?,?,?,?)",
+                (body_id, _compress(text), len(text), json.dumps(page_offsets) if page_offsets is not None else None),
+            )
+        cur.execute(
+            "INSERT INTO documents (id, filename, upload_path, extracted_path, uploaded_at, content_hash, body_id) VALUES (?,?,?,?,?,?,?)",
+            (doc_id, filename, upload_path, extracted_path, datetime.datetime.now(datetime.timezone.utc).isoformat(), content_hash, body_id),
+        )
+        cur.execute(
+            "INSERT INTO documents_fts (rowid, filename, text) VALUES (?,?,?)",
+            (cur.lastrowid, filename, text),
+        )
 
 
+@_timed
 def get_document(doc_id: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, filename, upload_path, extracted_path, text, uploaded_at FROM documents WHERE id=?",
-        (doc_id,),
-    )
-    row = cur.fetchone()
-    conn.close()
+    """Return document metadata (no text; see `get_document_text`), or None."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT id, filename, upload_path, extracted_path, uploaded_at, content_hash FROM documents WHERE id=?",
+            (doc_id,),
+        ).fetchone()
     if not row:
         return None
     return {
@@ -62,44 +339,515 @@ def get_document(doc_id: str):
         "filename": row[1],
         "upload_path": row[2],
         "extracted_path": row[3],
-        "text": row[4],
-        "uploaded_at": row[5],
+        "uploaded_at": row[4],
+        "content_hash": row[5],
     }
 
 
-def list_documents(limit: int = 100, offset: int = 0, q: str | None = None):
-    """Return documents with optional pagination and simple text search.
+@_timed
+def get_document_text(doc_id: str) -> str | None:
+    """Return the extracted text of a document, or None if there is no such document."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT b.body, d.text, d.extracted_path FROM documents d "
+            "LEFT JOIN document_bodies b ON b.id = d.body_id WHERE d.id=?",
+            (doc_id,),
+        ).fetchone()
+    if not row:
+        return None
+    return _stored_text(*row)
+
+
+def _stored_text(body, inline_text, extracted_path) -> str:
+    """Text of a document row from its body, legacy inline text or extracted file."""
+    if body is not None:
+        return _decompress(body)
+    if inline_text is not None:
+        return inline_text
+    # documents written by an external process before migration
+    if extracted_path and os.path.exists(extracted_path):
+        with open(extracted_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    return ""
 
-    - limit: max number of rows to return
-    - offset: rows to skip (for pagination)
-    - q: optional search term to match filename or excerpt of text
+
+@_timed
+def get_document_page_offsets(doc_id: str) -> list[int] | None:
+    """Return where each page starts in the document text (None if unknown).
+
+    Page i spans text[offsets[i]:offsets[i + 1] - 1]; pages are newline-joined.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    if q:
-        like = f"%{q}%"
-        cur.execute(
-            "SELECT id, filename, upload_path, extracted_path, uploaded_at FROM documents WHERE filename LIKE ? OR text LIKE ? ORDER BY uploaded_at DESC LIMIT ? OFFSET ?",
-            (like, like, limit, offset),
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT b.page_offsets FROM documents d JOIN document_bodies b ON b.id = d.body_id WHERE d.id=?",
+            (doc_id,),
+        ).fetchone()
+    if not row or row[0] is None:
+        return None
+    return json.loads(row[0])
+
+
+@_timed
+def get_body(body_id: str) -> tuple[str, list[int] | None] | None:
+    """Return (text, page_offsets) of a document body, or None."""
+    with connection() as conn:
+        row = conn.execute("SELECT body, page_offsets FROM document_bodies WHERE id=?", (body_id,)).fetchone()
+    if not row:
+        return None
+    return _decompress(row[0]), json.loads(row[1]) if row[1] is not None else None
+
+
+@_timed
+def get_segment_progress(body_id: str):
+    """Return {"version", "next_page", "complete"} for a body, or None if never segmented."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT version, next_page, complete FROM segment_progress WHERE body_id=?", (body_id,)
+        ).fetchone()
+    if not row:
+        return None
+    return {"version": row[0], "next_page": row[1], "complete": bool(row[2])}
+
+
+@_timed
+def store_segments(body_id: str, rows, version: int, next_page: int, complete: bool, restart: bool = False) -> None:
+    """Write one batch of (kind, start, end, tokens, page) segments and the progress after it.
+
+    Both happen in one transaction, so progress never runs ahead of the
+    rows. `restart` first drops the body's segments (e.g. from an older
+    version). Rows already present are replaced, so a batch can be redone.
+    """
+    with connection() as conn:
+        if restart:
+            conn.execute("DELETE FROM segments WHERE body_id=?", (body_id,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO segments (body_id, kind, start, end, tokens, page) VALUES (?,?,?,?,?,?)",
+            [(body_id, kind, start, end, tokens, page) for kind, start, end, tokens, page in rows],
         )
-    else:
-        cur.execute(
-            "SELECT id, filename, upload_path, extracted_path, uploaded_at FROM documents ORDER BY uploaded_at DESC LIMIT ? OFFSET ?",
-            (limit, offset),
+        conn.execute(
+            "INSERT INTO segment_progress (body_id, version, next_page, complete) VALUES (?,?,?,?) "
+            "ON CONFLICT(body_id) DO UPDATE SET version=excluded.version, next_page=excluded.next_page, "
+            "complete=excluded.complete",
+            (body_id, version, next_page, int(complete)),
         )
-    rows = cur.fetchall()
-    conn.close()
+
+
+@_timed
+def get_segments(doc_id: str, kind: str, version: int, limit: int | None = None) -> list[tuple[int, int, int]] | None:
+    """Return the document's `kind` segments as (start, end, tokens), in text order.
+
+    None unless the document's body has been fully segmented at `version`,
+    so callers can fall back to splitting the text themselves.
+    """
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT d.body_id FROM documents d JOIN segment_progress p ON p.body_id = d.body_id "
+            "WHERE d.id=? AND p.version=? AND p.complete",
+            (doc_id, version),
+        ).fetchone()
+        if not row:
+            return None
+        return conn.execute(
+            "SELECT start, end, tokens FROM segments WHERE body_id=? AND kind=? ORDER BY start LIMIT ?",
+            (row[0], kind, -1 if limit is None else limit),
+        ).fetchall()
+
+
+@_timed
+def bodies_needing_segments(version: int, limit: int = 10, exclude=()) -> list[str]:
+    """Ids of bodies that are unsegmented, partially segmented, or segmented at another version.
+
+    Bodies in `exclude` (e.g. ones that failed earlier in a run) are left out.
+    """
+    exclude = list(exclude)
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT b.id FROM document_bodies b LEFT JOIN segment_progress p ON p.body_id = b.id "
+            "WHERE (p.body_id IS NULL OR p.version != ? OR NOT p.complete) "
+            f"AND b.id NOT IN ({','.join('?' * len(exclude))}) LIMIT ?",
+            (version, *exclude, limit),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+@_timed
+def delete_document(doc_id: str):
+    """Delete a document with its search index entry and question bank.
+
+    The body (with its segments) and the uploaded file can be shared by
+    deduplicated uploads; they go with the last document using them.
+    Returns `{"upload_path", "upload_orphaned"}` (True when no other document
+    uses the file, so the caller may remove it), or None if there is no
+    such document.
+    """
+    with connection() as conn:
+        # take the write lock before reading, so the text repeated for the FTS
+        # delete is still the indexed text when the row goes
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT d.rowid, d.filename, d.body_id, d.content_hash, d.upload_path, b.body, d.text, d.extracted_path "
+            "FROM documents d LEFT JOIN document_bodies b ON b.id = d.body_id WHERE d.id=?",
+            (doc_id,),
+        ).fetchone()
+        if not row:
+            return None
+        rowid, filename, body_id, content_hash, upload_path = row[:5]
+        text = _stored_text(*row[5:])
+        # contentless FTS rows are removed by repeating the indexed values
+        conn.execute(
+            "INSERT INTO documents_fts (documents_fts, rowid, filename, text) VALUES ('delete', ?, ?, ?)",
+            (rowid, filename, text or ""),
+        )
+        conn.execute("DELETE FROM documents WHERE id=?", (doc_id,))
+        conn.execute("DELETE FROM questions WHERE doc_id=?", (doc_id,))
+        # other documents sharing the body or file have the same content hash
+        siblings = conn.execute(
+            "SELECT body_id, upload_path FROM documents WHERE content_hash=?", (content_hash,)
+        ).fetchall() if content_hash else []
+        if body_id and body_id not in {r[0] for r in siblings}:
+            conn.execute("DELETE FROM document_bodies WHERE id=?", (body_id,))
+            conn.execute("DELETE FROM segments WHERE body_id=?", (body_id,))
+            conn.execute("DELETE FROM segment_progress WHERE body_id=?", (body_id,))
+    return {"upload_path": upload_path, "upload_orphaned": upload_path not in {r[1] for r in siblings}}
+
+
+@_timed
+def find_document_by_hash(content_hash: str):
+    """Return the oldest document stored under `content_hash` (file type and upload bytes), or None."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT id FROM documents WHERE content_hash=? ORDER BY uploaded_at LIMIT 1",
+            (content_hash,),
+        ).fetchone()
+    if not row:
+        return None
+    return get_document(row[0])
+
+
+def _search_terms(q: str) -> list[str]:
+    return [t for t in re.findall(r"\w+", q.lower()) if t]
+
+
+def _fts_query(terms: list[str]) -> str:
+    # Quote every term so user input cannot inject FTS syntax; prefix-match
+    # each one so partial words still match as they did with LIKE.
+    return " ".join('"' + t.replace('"', '""') + '"*' for t in terms)
+
+
+def _excerpt(text: str, terms: list[str], width: int = 80) -> str:
+    """Return a short window of `text` around the first occurrence of any term."""
+    if not text:
+        return ""
+    lowered = text.lower()
+    hits = [i for i in (lowered.find(t) for t in terms) if i >= 0]
+    pos = min(hits) if hits else 0
+    start = max(0, pos - width)
+    end = min(len(text), pos + width)
+    snippet = " ".join(text[start:end].split())
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(text) else "")
+
+
+def encode_cursor(doc) -> str:
+    """Opaque keyset cursor pointing just after `doc` in the newest-first listing."""
+    raw = json.dumps([doc["uploaded_at"], doc["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return `(uploaded_at, id)` from a cursor; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        uploaded_at, doc_id = json.loads(raw)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(uploaded_at, str) or not isinstance(doc_id, str):
+        raise ValueError("invalid cursor")
+    return uploaded_at, doc_id
+
+
+@_timed
+def list_documents(limit: int = 100, offset: int = 0, q: str | None = None, cursor: str | None = None):
+    """Return documents with optional pagination and full-text search.
+
+    - limit: max number of rows to return
+    - offset: rows to skip (for pagination)
+    - q: optional search terms matched against filename and text through the
+      FTS5 index; results are ranked by relevance (bm25) and carry `score`
+      and a `snippet` excerpt
+    - cursor: keyset cursor from `encode_cursor` (newest-first listing only);
+      resumes after that document, so deep pages cost the same as the first
+    """
+    terms = _search_terms(q) if q else []
+    if q and not terms:
+        return []
+    with connection() as conn:
+        if terms:
+            rows = conn.execute(
+                """
+                SELECT d.id, d.filename, d.upload_path, d.extracted_path, d.uploaded_at, bm25(documents_fts) AS score, b.body
+                FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid
+                LEFT JOIN document_bodies b ON b.id = d.body_id
+                WHERE documents_fts MATCH ?
+                ORDER BY score LIMIT ? OFFSET ?
+                """,
+                (_fts_query(terms), limit, offset),
+            ).fetchall()
+        elif cursor:
+            uploaded_at, doc_id = decode_cursor(cursor)
+            rows = conn.execute(
+                "SELECT id, filename, upload_path, extracted_path, uploaded_at FROM documents "
+                "WHERE (uploaded_at, id) < (?, ?) ORDER BY uploaded_at DESC, id DESC LIMIT ?",
+                (uploaded_at, doc_id, limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id, filename, upload_path, extracted_path, uploaded_at FROM documents ORDER BY uploaded_at DESC, id DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
     docs = []
     for r in rows:
-        docs.append({
+        doc = {
             "id": r[0],
             "filename": r[1],
             "upload_path": r[2],
             "extracted_path": r[3],
             "uploaded_at": r[4],
-        })
+        }
+        if terms:
+            # bm25 is lower-is-better; flip the sign so higher means more relevant
+            doc["score"] = -r[5]
+            # only the bodies on this page are decompressed
+            doc["snippet"] = _excerpt(_decompress(r[6]) if r[6] is not None else "", terms)
+        docs.append(doc)
     return docs
 
 
-# initialize DB on import
-init_db()
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _job_row_to_dict(row):
+    return {
+        "id": row[0],
+        "doc_id": row[1],
+        "num_questions": row[2],
+        "status": row[3],
+        "result": json.loads(row[4]) if row[4] else None,
+        "error": row[5],
+        "created_at": row[6],
+        "updated_at": row[7],
+        "tenant": row[8],
+    }
+
+
+@_timed
+def create_job(job_id: str, doc_id: str, num_questions: int, tenant: str | None = None) -> None:
+    now = _now()
+    with connection() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, doc_id, num_questions, status, created_at, updated_at, tenant) VALUES (?,?,?,?,?,?,?)",
+            (job_id, doc_id, num_questions, "queued", now, now, tenant),
+        )
+
+
+@_timed
+def get_job(job_id: str):
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT id, doc_id, num_questions, status, result, error, created_at, updated_at, tenant FROM jobs WHERE id=?",
+            (job_id,),
+        ).fetchone()
+    if not row:
+        return None
+    return _job_row_to_dict(row)
+
+
+@_timed
+def claim_next_job(lease_seconds: float = 600.0, max_attempts: int | None = None):
+    """Atomically mark the oldest runnable job as running and return it.
+
+    A job is runnable when it is queued, or when it has been running for
+    longer than `lease_seconds` without renewing its lease (see
+    `renew_job_lease`; its worker died or the server restarted). A job
+    already claimed `max_attempts` times is marked failed instead of being
+    handed out again. Returns None when there is nothing to do.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    stale_before = (now - datetime.timedelta(seconds=lease_seconds)).isoformat()
+    with connection() as conn:
+        cur = conn.cursor()
+        # BEGIN IMMEDIATE takes the write lock up front so two workers
+        # (threads or processes) cannot claim the same job
+        cur.execute("BEGIN IMMEDIATE")
+        while True:
+            cur.execute(
+                "SELECT id, attempts FROM jobs WHERE status='queued' OR (status='running' AND updated_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (stale_before,),
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            if max_attempts is None or row[1] < max_attempts:
+                break
+            # it keeps dying with its worker: stop retrying it
+            cur.execute(
+                "UPDATE jobs SET status='failed', error=?, updated_at=? WHERE id=?",
+                (f"gave up after {row[1]} attempts", now.isoformat(), row[0]),
+            )
+        cur.execute(
+            "UPDATE jobs SET status='running', attempts=attempts+1, updated_at=? WHERE id=?", (now.isoformat(), row[0])
+        )
+        cur.execute(
+            "SELECT id, doc_id, num_questions, status, result, error, created_at, updated_at, tenant FROM jobs WHERE id=?",
+            (row[0],),
+        )
+        return _job_row_to_dict(cur.fetchone())
+
+
+@_timed
+def renew_job_lease(job_id: str) -> None:
+    """Keep a running job's lease from expiring while its worker is still on it."""
+    with connection() as conn:
+        conn.execute("UPDATE jobs SET updated_at=? WHERE id=? AND status='running'", (_now(), job_id))
+
+
+@_timed
+def finish_job(job_id: str, result=None, error: str | None = None) -> None:
+    """Record the outcome of a job: `done` with a JSON result, or `failed`."""
+    status = "failed" if error is not None else "done"
+    with connection() as conn:
+        conn.execute(
+            "UPDATE jobs SET status=?, result=?, error=?, updated_at=? WHERE id=?",
+            (status, json.dumps(result) if result is not None else None, error, _now(), job_id),
+        )
+
+
+@_timed
+def cache_get(key: str, max_age_seconds: float | None = None):
+    """Return `(mcqs, created_at)` for `key` and mark it used, or None if absent/expired."""
+    with connection() as conn:
+        row = conn.execute("SELECT mcqs, created_at FROM mcq_cache WHERE key=?", (key,)).fetchone()
+        if not row:
+            return None
+        if max_age_seconds is not None:
+            created = datetime.datetime.fromisoformat(row[1])
+            if (datetime.datetime.now(datetime.timezone.utc) - created).total_seconds() > max_age_seconds:
+                return None
+        conn.execute("UPDATE mcq_cache SET last_used_at=? WHERE key=?", (_now(), key))
+    return json.loads(row[0]), row[1]
+
+
+@_timed
+def cache_put(key: str, mcqs) -> int:
+    """Store MCQs under `key`; returns the stored size in bytes."""
+    payload = json.dumps(mcqs)
+    now = _now()
+    with connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO mcq_cache (key, mcqs, size, created_at, last_used_at) VALUES (?,?,?,?,?)",
+            (key, payload, len(payload), now, now),
+        )
+    return len(payload)
+
+
+@_timed
+def cache_evict(max_bytes: int, max_age_seconds: float) -> int:
+    """Drop entries older than `max_age_seconds`, then least recently used
+    entries until the cache holds at most `max_bytes`. Returns rows removed.
+    """
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=max_age_seconds)).isoformat()
+    with connection() as conn:
+        removed = conn.execute("DELETE FROM mcq_cache WHERE created_at < ?", (cutoff,)).rowcount
+        removed += conn.execute(
+            """
+            DELETE FROM mcq_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_used_at DESC, key) AS running FROM mcq_cache
+                ) WHERE running > ?
+            )
+            """,
+            (max_bytes,),
+        ).rowcount
+    return removed
+
+
+def _question_hash(question: str) -> str:
+    # case, punctuation and spacing do not make a question new
+    return hashlib.sha1(" ".join(re.findall(r"\w+", question.lower())).encode("utf-8")).hexdigest()
+
+
+@_timed
+def store_questions(doc_id: str, mcqs) -> int:
+    """Add MCQs to the document's question bank, skipping ones already in it; returns how many were added.
+
+    Nothing is added once the document has been deleted, so late results of
+    background generation do not outlive it.
+    """
+    now = _now()
+    rows = [
+        (doc_id, _question_hash(m["question"]), m["question"], json.dumps(m["options"]), m["answer_index"], now, doc_id)
+        for m in mcqs
+    ]
+    with connection() as conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO questions (doc_id, qhash, question, options, answer_index, created_at) "
+            "SELECT ?,?,?,?,?,? WHERE EXISTS (SELECT 1 FROM documents WHERE id=?)",
+            rows,
+        )
+        return conn.total_changes - before
+
+
+@_timed
+def copy_sibling_questions(doc_id: str) -> int:
+    """Bank, for `doc_id`, the questions already banked for other documents with
+    the same content hash (deduplicated uploads); returns how many were added."""
+    with connection() as conn:
+        return conn.execute(
+            "INSERT OR IGNORE INTO questions (doc_id, qhash, question, options, answer_index, created_at) "
+            "SELECT d.id, q.qhash, q.question, q.options, q.answer_index, ? FROM documents d "
+            "JOIN documents o ON o.content_hash = d.content_hash AND o.id != d.id "
+            "JOIN questions q ON q.doc_id = o.id WHERE d.id = ? ORDER BY q.id",
+            (_now(), doc_id),
+        ).rowcount
+
+
+@_timed
+def get_questions(doc_id: str) -> list[dict]:
+    """Return the document's banked questions in insertion order."""
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT id, question, options, answer_index FROM questions WHERE doc_id=? ORDER BY id", (doc_id,)
+        ).fetchall()
+    return [{"id": r[0], "question": r[1], "options": json.loads(r[2]), "answer_index": r[3]} for r in rows]
+
+
+@_timed
+def rate_limit_consume(key: str, capacity: float, rate_per_sec: float, now: float) -> bool:
+    """Refill `key`'s bucket to `now` and take one token, in a single statement.
+
+    The upsert runs as one atomic write, so concurrent processes cannot
+    both spend the same token. Returns whether a token was taken.
+    """
+    with connection() as conn:
+        rows = conn.execute(
+            """
+            INSERT INTO rate_limits (key, tokens, updated, allowed) VALUES (:key, :cap - 1, :now, :cap >= 1)
+            ON CONFLICT(key) DO UPDATE SET
+                tokens = min(:cap, tokens + max(:now - updated, 0) * :rate)
+                    - (min(:cap, tokens + max(:now - updated, 0) * :rate) >= 1),
+                allowed = min(:cap, tokens + max(:now - updated, 0) * :rate) >= 1,
+                updated = max(:now, updated)
+            RETURNING allowed
+            """,
+            {"key": key, "cap": capacity, "rate": rate_per_sec, "now": now},
+        ).fetchall()
+    return bool(rows[0][0])
+
+
+@_timed
+def rate_limit_evict(idle_before: float) -> int:
+    """Delete buckets not touched since `idle_before` (unix time). Returns rows removed."""
+    with connection() as conn:
+        return conn.execute("DELETE FROM rate_limits WHERE updated < ?", (idle_before,)).rowcount
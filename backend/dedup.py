@@ -0,0 +1,92 @@
+"""Near-duplicate question detection with MinHash signatures and LSH banding.
+
+Each question is reduced to a set of shingles (its words and adjacent word
+pairs) and a MinHash signature of that set. Signatures are cut into bands; only questions that share a
+band bucket are compared, by the exact Jaccard similarity of their
+shingle sets. Checking a question against the ones kept so far therefore
+costs a few dict lookups, not a pass over every earlier question.
+"""
+
+import os
+import re
+import zlib
+import random
+from typing import Any, Dict, List, Set, Tuple
+
+# Questions whose shingle-set Jaccard similarity reaches this are treated as
+# duplicates (1 = only identical shingle sets; above 1 disables the check)
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs at Jaccard 0.7 share a bucket ~99% of the time, at 0.5 ~64%
+BANDS = 16
+
+# One universal hash per signature row: h_i(x) = (a_i * crc32(x) + b_i) mod p.
+# XOR-ing a single hash with masks is not min-wise independent (the rows
+# move together), and crc32 keeps signatures the same across processes
+# instead of depending on PYTHONHASHSEED.
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: str) -> Set[str]:
+    words = re.findall(r"\w+", text.lower())
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def signature(items: Set[str]) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(s.encode()) for s in items] or [0]
+    return tuple(min([(a * h + b) % _PRIME for h in hashes]) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class Deduper:
+    """Accepts questions one at a time, rejecting near-duplicates of those already accepted."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._shingles: List[Set[str]] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(BANDS)]
+        # questions rejected so far
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def add(self, question: str) -> bool:
+        """Record `question` and return True, or return False if it duplicates an earlier one."""
+        items = shingles(question)
+        if self.threshold > 1:
+            self._shingles.append(items)
+            return True
+        sig = signature(items)
+        rows = NUM_PERM // BANDS
+        keys = [sig[i * rows:(i + 1) * rows] for i in range(BANDS)]
+        seen = set()
+        for band, key in zip(self._buckets, keys):
+            for index in band.get(key, ()):
+                if index not in seen:
+                    seen.add(index)
+                    if jaccard(items, self._shingles[index]) >= self.threshold:
+                        self.dropped += 1
+                        return False
+        index = len(self._shingles)
+        self._shingles.append(items)
+        for band, key in zip(self._buckets, keys):
+            band.setdefault(key, []).append(index)
+        return True
+
+
+def dedupe_mcqs(items: List[Dict[str, Any]], threshold: float = DEDUP_THRESHOLD, deduper: "Deduper | None" = None) -> List[Dict[str, Any]]:
+    """Drop MCQs whose question nearly repeats an earlier one, keeping order.
+
+    Pass a `deduper` to also check against (and record into) questions kept before.
+    """
+    deduper = deduper if deduper is not None else Deduper(threshold)
+    return [item for item in items if deduper.add(item.get("question", ""))]
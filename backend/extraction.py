@@ -0,0 +1,203 @@
+"""Text extraction for uploaded documents (pdf/docx/txt).
+
+Kept out of main.py so the extractors can run inside a worker process
+without importing the FastAPI app. pdfplumber and python-docx are imported
+on first use (see `load_parsers`), so importing this module is cheap.
+"""
+
+import os
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional, Tuple
+
+# parser modules, set on first use by _pdfplumber() / _docx()
+pdfplumber = None
+docx = None
+
+
+def _pdfplumber():
+    global pdfplumber
+    if pdfplumber is None:
+        try:
+            import pdfplumber as module
+        except Exception:
+            raise RuntimeError("pdfplumber not installed")
+        pdfplumber = module
+    return pdfplumber
+
+
+def _docx():
+    global docx
+    if docx is None:
+        try:
+            import docx as module
+        except Exception:
+            raise RuntimeError("python-docx not installed")
+        docx = module
+    return docx
+
+
+def load_parsers() -> None:
+    """Import the parser libraries now (e.g. to warm up a process); missing ones are skipped."""
+    for load in (_pdfplumber, _docx):
+        try:
+            load()
+        except RuntimeError:
+            pass
+
+
+def iter_pdf_pages(path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each page in turn, releasing its layout objects after use."""
+    with _pdfplumber().open(path) as pdf:
+        for i, page in enumerate(pdf.pages):
+            if max_pages and i >= max_pages:
+                break
+            try:
+                yield page.extract_text() or ""
+            finally:
+                # drop the cached chars/layout so memory stays flat across pages
+                page.close()
+
+
+def pdf_page_count(path: str) -> int:
+    with _pdfplumber().open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_range(path: str, start: int, stop: int, out_path: str) -> List[int]:
+    """Extract pages [start, stop) (0-based) into `out_path`, newline-joined.
+
+    Returns the length of each page's text; runs inside a pool worker.
+    """
+    lengths: List[int] = []
+    with _pdfplumber().open(path, pages=list(range(start + 1, stop + 1))) as pdf, \
+            open(out_path, "w", encoding="utf-8", errors="replace", newline="") as out:
+        for page in pdf.pages:
+            try:
+                page_text = page.extract_text() or ""
+            finally:
+                page.close()
+            if lengths:
+                out.write("\n")
+            out.write(page_text)
+            lengths.append(len(page_text))
+    return lengths
+
+
+def split_page_range(pages: int, parts: int) -> List[Tuple[int, int]]:
+    """Split `pages` into at most `parts` contiguous, near-equal (start, stop) ranges."""
+    parts = max(1, min(parts, pages))
+    size, extra = divmod(pages, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extract_pdf_parallel(path: str, out_path: str, executor: Executor, parts: int,
+                         max_pages: Optional[int] = None, pages: Optional[int] = None) -> List[int]:
+    """Like `extract_to_file` for a PDF, but with page ranges extracted in `executor`.
+
+    Each range is written to its own `out_path.<n>` file by a worker; the
+    files are then concatenated in page order, so the result (text and
+    offsets) is identical to the serial path. Blocks until done, so call it
+    from a thread rather than from inside the executor. Pass `pages` if the
+    page count is already known.
+    """
+    if pages is None:
+        pages = pdf_page_count(path)
+    if max_pages:
+        pages = min(pages, max_pages)
+    ranges = split_page_range(pages, parts) if pages else []
+    part_paths = [f"{out_path}.{i}" for i in range(len(ranges))]
+    futures = [
+        executor.submit(extract_pdf_range, path, start, stop, part_path)
+        for (start, stop), part_path in zip(ranges, part_paths)
+    ]
+    try:
+        offsets: List[int] = []
+        pos = 0
+        with open(out_path, "w", encoding="utf-8", newline="") as out:
+            for future, part_path in zip(futures, part_paths):
+                lengths = future.result()
+                if not lengths:
+                    continue
+                if offsets:
+                    out.write("\n")
+                    pos += 1
+                with open(part_path, "r", encoding="utf-8", newline="") as part:
+                    while True:
+                        block = part.read(1 << 20)
+                        if not block:
+                            break
+                        out.write(block)
+                for length in lengths:
+                    offsets.append(pos)
+                    pos += length + 1
+                pos -= 1
+        return offsets
+    finally:
+        for future in futures:
+            future.cancel()
+        for part_path in part_paths:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+
+
+def extract_text_from_pdf(path: str) -> str:
+    return "\n".join(iter_pdf_pages(path))
+
+
+def extract_text_from_docx(path: str) -> str:
+    doc = _docx().Document(path)
+    paragraphs = [p.text for p in doc.paragraphs]
+    return "\n".join(paragraphs)
+
+
+def extract_text_from_txt(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def iter_pages(path: str, filename: str, max_pages: Optional[int] = None) -> Iterator[str]:
+    """Yield text page by page; docx and txt files are a single page."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".pdf":
+        yield from iter_pdf_pages(path, max_pages)
+    else:
+        yield extract_text(path, filename)
+
+
+def extract_to_file(path: str, filename: str, out_path: str, max_pages: Optional[int] = None) -> List[int]:
+    """Extract text into `out_path` as it is produced, one page at a time.
+
+    Pages are joined with newlines, as in `extract_text`. Returns the
+    character offset at which each page starts in the written text. Only the
+    offsets (not the text) travel back when this runs in a worker process.
+    """
+    offsets: List[int] = []
+    pos = 0
+    with open(out_path, "w", encoding="utf-8", errors="replace", newline="") as out:
+        for i, page_text in enumerate(iter_pages(path, filename, max_pages)):
+            if i:
+                out.write("\n")
+                pos += 1
+            offsets.append(pos)
+            out.write(page_text)
+            pos += len(page_text)
+    return offsets
+
+
+def extract_text(path: str, filename: str) -> str:
+    """Pick an extractor based on the extension of the original filename."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".pdf":
+        return extract_text_from_pdf(path)
+    if ext in (".docx", ".doc"):
+        return extract_text_from_docx(path)
+    # treat as txt
+    return extract_text_from_txt(path)
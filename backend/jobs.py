@@ -0,0 +1,110 @@
+"""Background job workers for asynchronous MCQ generation.
+
+Jobs are persisted in the `jobs` table (see db.py), so queued work survives
+a restart. A small pool of asyncio worker tasks drains the table and hands
+each job to a handler coroutine supplied by the app.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from . import db
+except Exception:
+    import db
+
+# Number of jobs processed concurrently per server process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# How often idle workers re-check the table for work queued by other processes
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Running jobs whose worker has not renewed their lease for this many seconds
+# are picked up again (workers renew every third of it)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Claims after which a job that never finishes (e.g. it keeps killing its
+# worker) is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Longest pause between retries while the database keeps failing (seconds)
+_MAX_BACKOFF = 30.0
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+_tasks: List[asyncio.Task] = []
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+async def _renew_lease(job_id: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(db.renew_job_lease, job_id)
+        except Exception:
+            logger.exception("renewing the lease of job %s failed", job_id)
+
+
+async def _run_job(handler: JobHandler, job: Dict[str, Any]) -> None:
+    renewal = asyncio.create_task(_renew_lease(job["id"]))
+    try:
+        result = await handler(job)
+    except asyncio.CancelledError:
+        # leave the job as running; its lease expiry will requeue it
+        raise
+    except Exception as e:
+        await asyncio.to_thread(db.finish_job, job["id"], None, str(e) or type(e).__name__)
+    else:
+        await asyncio.to_thread(db.finish_job, job["id"], result)
+    finally:
+        renewal.cancel()
+
+
+async def _worker(handler: JobHandler) -> None:
+    backoff = 1.0
+    while True:
+        try:
+            job = await asyncio.to_thread(db.claim_next_job, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+            if job is None:
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await _run_job(handler, job)
+            backoff = 1.0
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # e.g. "database is locked": keep the worker alive and try again
+            logger.exception("job worker failed; retrying in %.0fs", backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, _MAX_BACKOFF)
+
+
+def start_workers(handler: JobHandler) -> None:
+    """Start the worker tasks on the running event loop if not already running."""
+    global _loop, _wakeup
+    loop = asyncio.get_running_loop()
+    if _loop is loop and any(not t.done() for t in _tasks):
+        return
+    _loop = loop
+    _wakeup = asyncio.Event()
+    _tasks.clear()
+    for _ in range(max(JOB_WORKERS, 1)):
+        _tasks.append(loop.create_task(_worker(handler)))
+
+
+async def stop_workers() -> None:
+    for t in _tasks:
+        t.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+def notify() -> None:
+    """Wake idle workers after a job has been queued by this process."""
+    if _wakeup is not None:
+        _wakeup.set()
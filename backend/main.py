@@ -3,22 +3,34 @@
 Endpoints:
 - POST /upload -> accept file (pdf/docx/txt), extract text, return doc_id
 - POST /generate -> generate MCQs using an LLM (OpenAI) for a given doc_id
+  (`?async=1` queues a job instead; poll GET /jobs/{job_id})
+- POST /generate/batch -> generate for many doc_ids, streamed back as NDJSON
+- POST /generate/stream -> MCQs as server-sent events, one per question
+- GET /documents/{id}/quiz -> quiz sampled from the document's question bank
+- DELETE /documents/{id} -> delete a document and its questions
 
-Storage: in-memory dict `DOC_STORE` holds extracted text and metadata.
+Storage: uploaded files under storage/uploads; metadata and compressed
+extracted text in SQLite (see db.py).
 """
 
 import os
 import uuid
 import json
 import time
+import re
+import random
+import hashlib
+import asyncio
+import logging
 import threading
-from typing import Dict, Any, List, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Set
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Header
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from time import sleep
 
 try:
     # when running as package
@@ -28,24 +40,260 @@ except Exception:
     import db
 
 try:
-    import pdfplumber
+    from . import jobs
 except Exception:
-    pdfplumber = None
+    import jobs
 
 try:
-    import docx
+    from . import ratelimit
 except Exception:
-    docx = None
+    import ratelimit
 
-import openai
+try:
+    from . import cache
+except Exception:
+    import cache
+
+try:
+    from . import scheduler
+except Exception:
+    import scheduler
+
+try:
+    from . import metrics
+except Exception:
+    import metrics
+
+try:
+    from . import chunking
+except Exception:
+    import chunking
+
+try:
+    from . import segmentation
+except Exception:
+    import segmentation
+
+try:
+    from . import dedup
+except Exception:
+    import dedup
+
+try:
+    from . import pregen
+except Exception:
+    import pregen
+
+try:
+    from .streaming import MCQStreamParser, sse_event
+except Exception:
+    from streaming import MCQStreamParser, sse_event
+
+try:
+    from .extraction import load_parsers, extract_to_file, extract_pdf_parallel, pdf_page_count
+except Exception:
+    from extraction import load_parsers, extract_to_file, extract_pdf_parallel, pdf_page_count
+
+
+def _openai():
+    """The OpenAI client module, imported on first use to keep startup fast."""
+    import openai
+
+    return openai
+
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(__file__)
-UPLOAD_DIR = os.path.join(BASE_DIR, "storage", "uploads")
-EXTRACTED_DIR = os.path.join(BASE_DIR, "storage", "extracted")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(EXTRACTED_DIR, exist_ok=True)
+# Allow overriding where uploaded files live (e.g. for benchmarks or deployments)
+STORAGE_DIR = os.getenv("QUIZGEN_STORAGE_DIR", os.path.join(BASE_DIR, "storage"))
+UPLOAD_DIR = os.path.join(STORAGE_DIR, "uploads")
+EXTRACTED_DIR = os.path.join(STORAGE_DIR, "extracted")
+# Uploads are streamed to disk (and hashed) in chunks of this many bytes, so
+# memory per upload stays bounded; bodies over MAX_UPLOAD_BYTES get a 413.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# Allowance for multipart boundaries and part headers when limiting the request body
+_MULTIPART_OVERHEAD = 64 * 1024
+_storage_ready = False
+
+
+def _ensure_storage() -> None:
+    # created by the lifespan hook; also on first upload when it did not run
+    global _storage_ready
+    if not _storage_ready:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        os.makedirs(EXTRACTED_DIR, exist_ok=True)
+        _storage_ready = True
+
+
+# STARTUP_WARMUP=1 loads the parsers, LLM client and extraction workers in the
+# background once the server is up, so the first real requests don't pay for it.
+_STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0").lower() in ("1", "true", "yes")
+
+# Extraction worker pool: pdfplumber is CPU-bound and holds the GIL, so text
+# extraction runs in a process pool instead of on the event loop.
+# EXTRACT_WORKERS=0 runs extraction in the default thread pool instead.
+_EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Uploads allowed to wait for a busy pool before new ones get a 503.
+_EXTRACT_QUEUE_LIMIT = int(os.getenv("EXTRACT_QUEUE_LIMIT", "16"))
+
+# Stop extracting PDFs after this many pages (0 = no limit)
+_EXTRACT_MAX_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", "0"))
+# Large PDFs are split into this many page ranges extracted in parallel by the
+# pool (1 = one worker per document); smaller PDFs are extracted serially.
+_EXTRACT_PDF_PARTS = int(os.getenv("EXTRACT_PDF_PARTS", str(_EXTRACT_WORKERS or 1)))
+_EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", "64"))
+
+_extract_pool: Optional[Executor] = None
+_extract_pool_lock = threading.Lock()
+_extract_inflight = 0
+
+
+def _get_extract_pool() -> Optional[Executor]:
+    global _extract_pool
+    if _EXTRACT_WORKERS <= 0:
+        return None
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(max_workers=_EXTRACT_WORKERS)
+        return _extract_pool
+
+
+def _shutdown_extract_pool() -> None:
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
+            _extract_pool = None
+
+
+def _extract_capacity() -> int:
+    return max(_EXTRACT_WORKERS, 1) + max(_EXTRACT_QUEUE_LIMIT, 0)
+
+
+async def run_extraction(path: str, filename: str, out_path: str) -> List[int]:
+    """Extract text into `out_path` off the event loop, in the extraction pool.
+
+    Returns the page start offsets (see `extract_to_file`).
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_extract_pool()
+    max_pages = _EXTRACT_MAX_PAGES or None
+    if pool is not None and _EXTRACT_PDF_PARTS > 1 and os.path.splitext(filename)[1].lower() == ".pdf":
+        pages = await loop.run_in_executor(pool, pdf_page_count, path)
+        if min(pages, max_pages or pages) >= _EXTRACT_PARALLEL_MIN_PAGES:
+            # blocks on the pool's futures, so coordinate from a thread
+            return await asyncio.to_thread(extract_pdf_parallel, path, out_path, pool, _EXTRACT_PDF_PARTS, max_pages, pages)
+    return await loop.run_in_executor(pool, extract_to_file, path, filename, out_path, max_pages)
+
+
+async def _warm_up() -> None:
+    await asyncio.to_thread(load_parsers)
+    await asyncio.to_thread(_openai)
+    pool = _get_extract_pool()
+    if pool is not None:
+        # start every worker process and import the parsers in each
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, load_parsers) for _ in range(_EXTRACT_WORKERS)))
+
+
+# Segment documents stored before segmentation existed (or by an older
+# segmentation version) in the background after startup
+_SEGMENT_BACKFILL = os.getenv("SEGMENT_BACKFILL", "1") == "1"
+# Longest pause between backfill attempts while the database keeps failing (seconds)
+_SEGMENT_BACKFILL_MAX_BACKOFF = 60.0
+
+
+async def _backfill_segments() -> None:
+    # bodies that failed to segment are skipped for the rest of this run
+    failed: Set[str] = set()
+    backoff = 1.0
+    while True:
+        try:
+            if not await asyncio.to_thread(segmentation.backfill, 10, failed):
+                return
+            backoff = 1.0
+        except Exception:
+            logger.exception("segment backfill failed; retrying in %.0fs", backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, _SEGMENT_BACKFILL_MAX_BACKOFF)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema and storage setup happen here rather than at import time
+    await asyncio.to_thread(db.init_db)
+    _ensure_storage()
+    # resume generation jobs left queued (or interrupted) by a previous run
+    jobs.start_workers(_run_generation_job)
+    warm_up = asyncio.create_task(_warm_up()) if _STARTUP_WARMUP else None
+    backfill = asyncio.create_task(_backfill_segments()) if _SEGMENT_BACKFILL else None
+    yield
+    for task in (warm_up, backfill):
+        if task is not None:
+            task.cancel()
+    await jobs.stop_workers()
+    await _pregen.shutdown()
+    _shutdown_extract_pool()
+    db.close_all()
+
+
+app = FastAPI(title="quizgen-backend", lifespan=lifespan)
+
+
+class UploadSizeLimit:
+    """Refuse POST /upload bodies larger than the upload limit plus multipart overhead.
+
+    Starlette spools the whole multipart body before the handler runs, so the
+    limit is enforced here: from Content-Length when one is sent, otherwise by
+    counting bytes as they are received and failing the read once over.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/upload":
+            await self.app(scope, receive, send)
+            return
+        limit = MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            await JSONResponse({"detail": "Upload too large"}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes the 413
+                    raise HTTPException(status_code=413, detail="Upload too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(UploadSizeLimit)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template (e.g. /files/{doc_id}) to keep cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, path, str(status))
 
-app = FastAPI(title="quizgen-backend")
 
 # Allow CORS from the frontend dev server(s)
 app.add_middleware(
@@ -60,37 +308,13 @@ app.add_middleware(
 _API_KEYS = set([k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()])
 _RATE_LIMIT_PER_MIN = int(os.getenv("RATE_LIMIT_PER_MIN", "0"))
 
-# in-memory token buckets: key -> {tokens, last_refill}
-_buckets: Dict[str, Dict[str, float]] = {}
-_bucket_lock = threading.Lock()
-
-
-def _refill_bucket(key: str):
-    if _RATE_LIMIT_PER_MIN <= 0:
-        return
-    now = time.time()
-    with _bucket_lock:
-        b = _buckets.get(key)
-        if not b:
-            _buckets[key] = {"tokens": float(_RATE_LIMIT_PER_MIN), "last": now}
-            return
-        elapsed = now - b["last"]
-        # tokens to add
-        add = elapsed * (_RATE_LIMIT_PER_MIN / 60.0)
-        b["tokens"] = min(float(_RATE_LIMIT_PER_MIN), b["tokens"] + add)
-        b["last"] = now
+_limiter = ratelimit.make_limiter(_RATE_LIMIT_PER_MIN)
 
 
 def _consume_token(key: str) -> bool:
     if _RATE_LIMIT_PER_MIN <= 0:
         return True
-    _refill_bucket(key)
-    with _bucket_lock:
-        b = _buckets.setdefault(key, {"tokens": float(_RATE_LIMIT_PER_MIN), "last": time.time()})
-        if b["tokens"] >= 1.0:
-            b["tokens"] -= 1.0
-            return True
-        return False
+    return _limiter.consume(key)
 
 
 def require_api_key(x_api_key: Optional[str] = Header(None)) -> Optional[str]:
@@ -102,118 +326,359 @@ def require_api_key(x_api_key: Optional[str] = Header(None)) -> Optional[str]:
     return x_api_key
 
 
-def rate_limit_dependency(api_key: Optional[str] = Depends(require_api_key)):
-    # Use provided api_key (or __anon__) as bucket key
+def rate_limit_dependency(api_key: Optional[str] = Depends(require_api_key)) -> str:
+    # Use provided api_key (or __anon__) as bucket key; it also names the
+    # tenant whose LLM budget the request is charged to
     key = api_key or "__anon__"
     if not _consume_token(key):
+        metrics.RATE_LIMIT_REJECTIONS.inc()
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    return True
+    return key
 
 
-def extract_text_from_pdf(path: str) -> str:
-    if not pdfplumber:
-        raise RuntimeError("pdfplumber not installed")
-    text_parts: List[str] = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            text_parts.append(page.extract_text() or "")
-    return "\n".join(text_parts)
+def _first_sentences(text: str, n: int) -> List[str]:
+    # stops after n sentences instead of splitting the whole document
+    sentences = []
+    for m in re.finditer(r"[^.]+", text):
+        if len(sentences) >= n:
+            break
+        sentence = m.group().replace("\n", " ").strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
 
 
-def extract_text_from_docx(path: str) -> str:
-    if not docx:
-        raise RuntimeError("python-docx not installed")
-    doc = docx.Document(path)
-    paragraphs = [p.text for p in doc.paragraphs]
-    return "\n".join(paragraphs)
+def _document_sentences(doc_id: Optional[str], text: str, n: int) -> Optional[List[str]]:
+    """First `n` sentences from the document's stored segments, or None if it is not segmented."""
+    if doc_id is None or n <= 0:
+        return None
+    spans = db.get_segments(doc_id, "sentence", segmentation.SEGMENT_VERSION, limit=n)
+    if spans is None:
+        return None
+    return [" ".join(text[start:end].split()).rstrip(".") for start, end, _ in spans]
 
 
-def extract_text_from_txt(path: str) -> str:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
-
-
-def generate_dummy_mcqs(text: str, n: int) -> List[Dict[str, Any]]:
+def generate_dummy_mcqs(text: str, n: int, sentences: Optional[List[str]] = None, deduper: Optional[dedup.Deduper] = None) -> List[Dict[str, Any]]:
     # Very small deterministic fallback: create questions from first n sentences
-    sentences = [s.strip() for s in text.replace("\n", " ").split('.') if s.strip()]
+    # (precomputed from the document's segments when the caller has them),
+    # skipping those `deduper` rejects as near-duplicates of questions it has seen
+    if sentences is None:
+        sentences = _first_sentences(text, n if deduper is None else n + len(deduper))
     mcqs = []
-    for i in range(min(n, len(sentences))):
-        q = sentences[i]
+    for q in sentences:
+        if len(mcqs) >= n:
+            break
+        question = f"What is the main idea of: {q}?"
+        if deduper is not None and not deduper.add(question):
+            continue
         mcqs.append({
-            "question": f"What is the main idea of: {q}?",
+            "question": question,
             "options": [q, "Not related", "Partially related", "Opposite"],
             "answer_index": 0,
         })
-    # If not enough sentences, pad with generic questions
+    # If not enough sentences, pad with generic questions (numbered, so no two are the same)
     while len(mcqs) < n:
         mcqs.append({
-            "question": "Generate a meaningful question from the document.",
+            "question": f"Generate a meaningful question from the document (#{len(mcqs) + 1}).",
             "options": ["Option A", "Option B", "Option C", "Option D"],
             "answer_index": 0,
         })
     return mcqs
 
 
-def call_openai_generate(text: str, n: int) -> List[Dict[str, Any]]:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    openai.api_key = api_key
-    system = (
-        "You are an assistant that generates multiple-choice questions (MCQs). "
-        "Given an input document, produce exactly the requested number of questions. "
-        "Return a JSON array only, where each element is an object with keys: "
-        "'question' (string), 'options' (array of 4 strings), 'answer_index' (integer 0-3)."
-    )
+# LLM client settings: max concurrent completions per process, per-call
+# timeout (seconds) and the initial retry backoff (doubles per attempt)
+_LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+_LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+_LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1.0"))
+
+# All LLM calls go through the scheduler: at most _LLM_CONCURRENCY in flight,
+# prompt tokens charged per tenant (API key), tenants served round-robin.
+_llm_scheduler = scheduler.LLMScheduler(_LLM_CONCURRENCY, weights=scheduler.parse_weights(scheduler.LLM_TENANT_WEIGHTS))
+
+
+def _prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(chunking.estimate_tokens(m["content"]) for m in messages)
+
+
+async def _chat_completion(messages: List[Dict[str, str]], temperature: float) -> str:
+    """Run one chat completion without blocking the event loop."""
+    async with _llm_scheduler.slot(_prompt_tokens(messages)):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            resp = await asyncio.wait_for(
+                _openai().ChatCompletion.acreate(
+                    model=os.getenv("MODEL", "gpt-4o-mini"),
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=1500,
+                ),
+                timeout=_LLM_TIMEOUT,
+            )
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - start, outcome)
+    return resp.choices[0].message.content
+
+
+async def _chat_completion_stream(messages: List[Dict[str, str]], temperature: float):
+    """Yield pieces of a streamed chat completion as the model emits them."""
+    loop = asyncio.get_running_loop()
+    # _LLM_TIMEOUT bounds the whole completion, not each chunk
+    deadline = loop.time() + _LLM_TIMEOUT
+    async with _llm_scheduler.slot(_prompt_tokens(messages)):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            resp = await asyncio.wait_for(
+                _openai().ChatCompletion.acreate(
+                    model=os.getenv("MODEL", "gpt-4o-mini"),
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=1500,
+                    stream=True,
+                ),
+                timeout=_LLM_TIMEOUT,
+            )
+            if not hasattr(resp, "__aiter__"):
+                # client without streaming support: one piece with everything
+                outcome = "ok"
+                yield resp.choices[0].message.content
+                return
+            chunks = resp.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    outcome = "ok"
+                    return
+                delta = chunk.choices[0].delta
+                piece = delta.get("content") if isinstance(delta, dict) else getattr(delta, "content", None)
+                if piece:
+                    yield piece
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - start, outcome)
+
+
+# Bump whenever the prompts below change; it is part of the MCQ cache key.
+PROMPT_VERSION = "1"
+
+
+async def _dummy_mcqs(text: str, n: int, doc_id: Optional[str] = None, deduper: Optional[dedup.Deduper] = None) -> List[Dict[str, Any]]:
+    """`generate_dummy_mcqs`, using the document's stored sentences when `doc_id` is given."""
+    # a question `deduper` has seen can rule out about one sentence, so read that many more
+    wanted = n if deduper is None else n + len(deduper)
+    sentences = await asyncio.to_thread(_document_sentences, doc_id, text, wanted) if doc_id else None
+    return generate_dummy_mcqs(text, n, sentences, deduper)
+
+
+async def _pad_with_dummies(
+    text: str,
+    validated: List[Dict[str, Any]],
+    n: int,
+    info: Dict[str, Any],
+    doc_id: Optional[str] = None,
+    deduper: Optional[dedup.Deduper] = None,
+) -> List[Dict[str, Any]]:
+    """Top `validated` up to `n` with dummy questions that do not repeat it (or what `deduper` has seen)."""
+    if len(validated) >= n:
+        return validated[:n]
+    info["padded"] = n - len(validated)
+    metrics.DUMMY_FALLBACKS.inc("padded")
+    if deduper is None:
+        deduper = dedup.Deduper()
+        for item in validated:
+            deduper.add(item["question"])
+    return validated + await _dummy_mcqs(text, n - len(validated), doc_id, deduper)
+
+
+_SYSTEM_PROMPT = (
+    "You are an assistant that generates multiple-choice questions (MCQs). "
+    "Given an input document, produce exactly the requested number of questions. "
+    "Return a JSON array only, where each element is an object with keys: "
+    "'question' (string), 'options' (array of 4 strings), 'answer_index' (integer 0-3)."
+)
+
+_RECOVERY_PROMPT = (
+    "The previous response could not be parsed as JSON matching the required schema. "
+    "Respond with a JSON array only (no surrounding text). Each element must be an object with keys: "
+    "'question' (string), 'options' (array of 4 strings), 'answer_index' (integer 0-3)."
+)
+
+# POST /generate/batch: items generated concurrently per batch, and max items per batch
+_BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+_BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
 
+# Documents estimated above this many tokens are generated chunk by chunk
+# (map-reduce), with at most GENERATION_FANOUT chunk calls in flight per request.
+_CHUNK_TOKENS = int(os.getenv("GENERATION_CHUNK_TOKENS", "6000"))
+_GENERATION_FANOUT = int(os.getenv("GENERATION_FANOUT", "4"))
+
+
+async def _llm_generate_validated(text: str, n: int, avoid: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+    """Ask the LLM for `n` MCQs about `text`, with retries and recovery prompts.
+
+    `avoid` lists questions already generated that should not be repeated.
+    Returns the validated items (possibly fewer than `n`), or None when every
+    attempt failed.
+    """
     user = (
-        f"Document:\n" + text + "\n\n" + f"Generate {n} MCQs."
+        "Document:\n" + text + "\n\n" + f"Generate {n} MCQs."
     )
+    if avoid:
+        user += "\nDo not repeat or rephrase these questions:\n" + "\n".join(f"- {q}" for q in avoid)
 
     # Use ChatCompletion API with retries and validation
     max_attempts = 3
-    backoff = 1.0
+    backoff = _LLM_BACKOFF
     for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            metrics.LLM_RETRIES.inc()
         try:
-            resp = openai.ChatCompletion.create(
-                model=os.getenv("MODEL", "gpt-4o-mini"),
-                messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            content = await _chat_completion(
+                [{"role": "system", "content": _SYSTEM_PROMPT}, {"role": "user", "content": user}],
                 temperature=0.0 if attempt > 1 else 0.2,
-                max_tokens=1500,
             )
-            content = resp.choices[0].message.content
 
             # Try parse and validate
             parsed = json.loads(content)
-            validated = validate_mcqs(parsed)
-            return validated[:n] if len(validated) >= n else (validated + generate_dummy_mcqs(text, n - len(validated)))
+            return validate_mcqs(parsed)
         except Exception:
             # If not last attempt, try a recovery request asking for JSON-only output
             if attempt < max_attempts:
+                metrics.LLM_RECOVERY_PROMPTS.inc()
                 try:
-                    recovery_prompt = (
-                        "The previous response could not be parsed as JSON matching the required schema. "
-                        "Respond with a JSON array only (no surrounding text). Each element must be an object with keys: "
-                        "'question' (string), 'options' (array of 4 strings), 'answer_index' (integer 0-3)."
-                    )
-                    resp = openai.ChatCompletion.create(
-                        model=os.getenv("MODEL", "gpt-4o-mini"),
-                        messages=[{"role": "system", "content": system}, {"role": "user", "content": recovery_prompt + "\n\nOriginal document:\n" + text}],
+                    content = await _chat_completion(
+                        [{"role": "system", "content": _SYSTEM_PROMPT}, {"role": "user", "content": _RECOVERY_PROMPT + "\n\nOriginal document:\n" + text}],
                         temperature=0.0,
-                        max_tokens=1500,
                     )
-                    content = resp.choices[0].message.content
                     parsed = json.loads(content)
-                    validated = validate_mcqs(parsed)
-                    return validated[:n] if len(validated) >= n else (validated + generate_dummy_mcqs(text, n - len(validated)))
+                    return validate_mcqs(parsed)
                 except Exception:
-                    sleep(backoff)
+                    await asyncio.sleep(backoff)
                     backoff *= 2
                     continue
             else:
                 break
-    # All attempts failed — fallback to deterministic generator
-    return generate_dummy_mcqs(text, n)
+    return None
+
+
+async def _generate_chunked(chunks: List[str], n: int, avoid: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+    """Map step: generate questions for each chunk concurrently (bounded fan-out).
+
+    Returns the per-chunk results in document order, skipping failed chunks.
+    """
+    selected = chunking.spread(chunks, max(n, 1))
+    per_chunk = -(-n // len(selected))
+    fanout = asyncio.Semaphore(max(_GENERATION_FANOUT, 1))
+
+    async def _one(chunk: str):
+        async with fanout:
+            return await _llm_generate_validated(chunk, per_chunk, avoid)
+
+    results = await asyncio.gather(*(_one(c) for c in selected))
+    return [r for r in results if r]
+
+
+async def _refill_duplicates(text: str, chunks: List[str], avoid: List[str], k: int, deduper: dedup.Deduper) -> List[Dict[str, Any]]:
+    """One more round for `k` questions to replace near-duplicates that were dropped.
+
+    The prompt lists the questions already kept (`avoid`); anything that
+    still duplicates them is dropped too, and the caller pads what is missing.
+    """
+    if len(chunks) <= 1:
+        extra = await _llm_generate_validated(text, k, avoid) or []
+        return dedup.dedupe_mcqs(extra, deduper=deduper)[:k]
+    return chunking.merge_mcqs(await _generate_chunked(chunks, k, avoid), k, deduper)
+
+
+async def _document_chunks(text: str, doc_id: Optional[str]) -> List[str]:
+    """Chunks of a large document, packed from its stored paragraph segments when available."""
+    spans = await asyncio.to_thread(db.get_segments, doc_id, "paragraph", segmentation.SEGMENT_VERSION) if doc_id else None
+    if spans:
+        return chunking.pack_spans(text, spans, _CHUNK_TOKENS)
+    return chunking.split_into_chunks(text, _CHUNK_TOKENS)
+
+
+async def _call_openai_generate_detailed(text: str, n: int, doc_id: Optional[str] = None, avoid: Optional[List[str]] = None):
+    """Like `call_openai_generate_async` but also report how the result was produced.
+
+    Returns `(mcqs, info)` where info has `padded` (number of dummy questions
+    appended), `fallback` (True when every attempt failed) and `chunks`
+    (number of chunks the document was split into). With `doc_id`, chunks
+    and dummy questions come from the document's stored segments. Questions
+    in `avoid` are listed in the prompt and their near-duplicates dropped.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    _openai().api_key = api_key
+
+    chunks = [text] if chunking.estimate_tokens(text) <= _CHUNK_TOKENS else await _document_chunks(text, doc_id)
+    info: Dict[str, Any] = {"padded": 0, "fallback": False, "chunks": max(len(chunks), 1)}
+    deduper = dedup.Deduper()
+    for question in avoid or ():
+        deduper.add(question)
+    deduper.dropped = 0
+    if len(chunks) <= 1:
+        validated = await _llm_generate_validated(text, n, avoid)
+        if validated is not None:
+            validated = dedup.dedupe_mcqs(validated, deduper=deduper)
+    else:
+        # Reduce step: dedupe and spread the questions across the document
+        results = await _generate_chunked(chunks, n, avoid)
+        validated = chunking.merge_mcqs(results, n, deduper) if results else None
+    if validated is not None and deduper.dropped and len(validated) < n:
+        validated += await _refill_duplicates(text, chunks, (avoid or []) + [m["question"] for m in validated], n - len(validated), deduper)
+    metrics.DUPLICATES_DROPPED.inc(amount=deduper.dropped)
+
+    if validated is None:
+        # All attempts failed — fallback to deterministic generator
+        info["fallback"] = True
+        metrics.DUMMY_FALLBACKS.inc("full")
+        return await _dummy_mcqs(text, n, doc_id), info
+    return await _pad_with_dummies(text, validated, n, info, doc_id, deduper), info
+
+
+async def _pregenerate(doc_id: str, n: int) -> None:
+    """Pre-generation handler (see pregen.py): bank `n` questions for a new document."""
+    text = await asyncio.to_thread(db.get_document_text, doc_id)
+    if text is None:
+        return
+    # deduplicated uploads share their text: reuse questions already cached for
+    # it or banked for another copy before paying for new ones
+    key = cache.make_key(text, os.getenv("MODEL", "gpt-4o-mini"), n, PROMPT_VERSION)
+    hit = await asyncio.to_thread(cache.get, key)
+    if hit is not None:
+        await asyncio.to_thread(db.store_questions, doc_id, hit)
+    await asyncio.to_thread(db.copy_sibling_questions, doc_id)
+    if len(await asyncio.to_thread(db.get_questions, doc_id)) >= n:
+        return
+    mcqs, info = await _call_openai_generate_detailed(text, n, doc_id)
+    if info["fallback"]:
+        raise RuntimeError("LLM generation failed")
+    await asyncio.to_thread(db.store_questions, doc_id, mcqs[:len(mcqs) - info["padded"]])
+
+
+# Background question generation for new uploads (PREGEN_* settings)
+_pregen = pregen.Pregenerator(_pregenerate)
+
+
+async def call_openai_generate_async(text: str, n: int) -> List[Dict[str, Any]]:
+    mcqs, _ = await _call_openai_generate_detailed(text, n)
+    return mcqs
+
+
+def call_openai_generate(text: str, n: int) -> List[Dict[str, Any]]:
+    """Blocking wrapper around `call_openai_generate_async` for code without an event loop."""
+    return asyncio.run(call_openai_generate_async(text, n))
 
 
 class GenerateRequest(BaseModel):
@@ -250,63 +715,458 @@ def validate_mcqs(data: Any) -> List[Dict[str, Any]]:
     return validated
 
 
+def _file_type(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return ext if ext in ("pdf", "docx", "doc", "txt") else "other"
+
+
+def _extraction_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Extraction queue is full, retry later", headers={"Retry-After": "1"})
+
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...), _auth=Depends(rate_limit_dependency)):
-    # Save uploaded file to disk
-    contents = await file.read()
+    global _extract_inflight
+    # Refuse early, before reading the body, when the extraction pool is saturated
+    if _extract_inflight >= _extract_capacity():
+        raise _extraction_busy()
+    _ensure_storage()
+    timings: Dict[str, float] = {}
+
+    # Save uploaded file to disk, hashing it on the way
+    t0 = time.perf_counter()
     doc_id = str(uuid.uuid4())
     filename = f"{doc_id}_{file.filename}"
     save_path = os.path.join(UPLOAD_DIR, filename)
-    with open(save_path, "wb") as f:
-        f.write(contents)
+    part_path = save_path + ".part"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+                hasher.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(part_path)
+        raise
+    # extracted text depends on the extractor too, so the same bytes under
+    # another file type are a different document body
+    content_hash = f"{_file_type(file.filename)}:{hasher.hexdigest()}"
+
+    # Byte-identical file of the same type seen before: reuse its blob and extracted text
+    existing = await asyncio.to_thread(db.find_document_by_hash, content_hash)
+    existing_text = await asyncio.to_thread(db.get_document_text, existing["id"]) if existing else None
+    if existing and existing_text is not None and os.path.exists(existing["upload_path"] or ""):
+        os.remove(part_path)
+        await asyncio.to_thread(
+            db.create_document,
+            doc_id=doc_id,
+            filename=file.filename,
+            upload_path=existing["upload_path"],
+            extracted_path=None,
+            text=existing_text,
+            content_hash=content_hash,
+        )
+        timings["save"] = time.perf_counter() - t0
+        metrics.UPLOAD_SAVE_SECONDS.observe(timings["save"])
+        _pregen.submit(doc_id, _auth, content_hash)
+        server_timing = ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in timings.items())
+        return JSONResponse({"doc_id": doc_id, "deduplicated": True}, headers={"Server-Timing": server_timing})
 
-    # Extract text based on extension
-    ext = os.path.splitext(file.filename)[1].lower()
+    os.replace(part_path, save_path)
+    timings["save"] = time.perf_counter() - t0
+    metrics.UPLOAD_SAVE_SECONDS.observe(timings["save"])
+
+    # Extract text based on extension, off the event loop; the worker
+    # writes it page by page into a spool file
+    t0 = time.perf_counter()
+    spool_path = os.path.join(EXTRACTED_DIR, f"{doc_id}.txt.part")
+    # only extraction counts against the pool's capacity: saving a slow
+    # client's body or a deduplicated upload does not occupy a worker
+    if _extract_inflight >= _extract_capacity():
+        os.remove(save_path)
+        raise _extraction_busy()
+    _extract_inflight += 1
     try:
-        if ext == ".pdf":
-            text = extract_text_from_pdf(save_path)
-        elif ext in (".docx", ".doc"):
-            text = extract_text_from_docx(save_path)
-        else:
-            # treat as txt
-            text = extract_text_from_txt(save_path)
+        page_offsets = await run_extraction(save_path, file.filename, spool_path)
+        with open(spool_path, "r", encoding="utf-8", newline="") as sf:
+            text = sf.read()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to extract text: {e}")
+    finally:
+        _extract_inflight -= 1
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+    timings["extract"] = time.perf_counter() - t0
+    metrics.EXTRACTION_SECONDS.observe(timings["extract"], _file_type(file.filename))
+
+    # persist extracted text (compressed) and metadata to the SQLite DB
+    t0 = time.perf_counter()
+    await asyncio.to_thread(
+        db.create_document,
+        doc_id=doc_id,
+        filename=file.filename,
+        upload_path=save_path,
+        extracted_path=None,
+        text=text,
+        content_hash=content_hash,
+        page_offsets=page_offsets,
+    )
+    timings["persist"] = time.perf_counter() - t0
 
-    # persist extracted text to disk and to SQLite DB
-    extracted_path = os.path.join(EXTRACTED_DIR, f"{doc_id}.txt")
-    with open(extracted_path, "w", encoding="utf-8") as ef:
-        ef.write(text)
+    # sentence/paragraph/page index used by generation; the startup backfill
+    # picks the document up again if this fails
+    t0 = time.perf_counter()
+    try:
+        await asyncio.to_thread(segmentation.segment_body, content_hash, text, page_offsets)
+    except Exception:
+        logger.exception("segmenting document %s failed; the backfill will retry it", doc_id)
+    timings["segment"] = time.perf_counter() - t0
+    _pregen.submit(doc_id, _auth, content_hash)
 
-    # store in sqlite DB
-    db.create_document(doc_id=doc_id, filename=file.filename, upload_path=save_path, extracted_path=extracted_path, text=text)
+    # Per-stage timings (ms) for sizing the extraction pool
+    server_timing = ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in timings.items())
+    return JSONResponse({"doc_id": doc_id, "deduplicated": False}, headers={"Server-Timing": server_timing})
 
-    return JSONResponse({"doc_id": doc_id})
 
+async def _banked_mcqs(doc_id: str, n: int) -> Optional[List[Dict[str, Any]]]:
+    """The first `n` questions of the document's bank, once pre-generation
+    for it has settled; None if the bank holds fewer."""
+    await _pregen.settle(doc_id)
+    banked = await asyncio.to_thread(db.get_questions, doc_id)
+    if len(banked) < n:
+        return None
+    return [{k: q[k] for k in ("question", "options", "answer_index")} for q in banked[:n]]
 
-@app.post("/generate")
-async def generate_mcqs(req: GenerateRequest, _auth=Depends(rate_limit_dependency)):
-    doc = db.get_document(req.doc_id)
-    if not doc:
-        raise HTTPException(status_code=404, detail="doc_id not found")
-    text = doc.get("text", "")
+
+async def _generate_for_text(text: str, n: int, fresh: bool = False, doc_id: Optional[str] = None):
+    """Generate MCQs for `text` (the text of `doc_id`, if given), serving from the MCQ cache when possible.
+
+    Returns `(mcqs, meta)` where meta has `cached`, `padded` (dummy questions
+    appended) and `fallback` (True when the dummy generator produced the
+    whole set). Only complete LLM results are cached; dummy fallbacks and
+    padded sets are regenerated next time. A document whose question bank
+    already holds `n` questions (e.g. pre-generated after upload) is served
+    from the bank.
+    """
+    key = cache.make_key(text, os.getenv("MODEL", "gpt-4o-mini"), n, PROMPT_VERSION)
+    if not fresh:
+        hit = await asyncio.to_thread(cache.get, key)
+        if hit is not None:
+            return hit, {"cached": True, "padded": 0, "fallback": False}
+        banked = await _banked_mcqs(doc_id, n) if doc_id else None
+        if banked is not None:
+            return banked, {"cached": True, "padded": 0, "fallback": False}
     # Try using OpenAI if configured, otherwise fallback
     try:
-        mcqs = call_openai_generate(text, req.num_questions)
+        mcqs, info = await _call_openai_generate_detailed(text, n, doc_id)
     except Exception:
-        mcqs = generate_dummy_mcqs(text, req.num_questions)
+        metrics.DUMMY_FALLBACKS.inc("full")
+        return await _dummy_mcqs(text, n, doc_id), {"cached": False, "padded": 0, "fallback": True}
+    if not info["fallback"] and not info["padded"]:
+        await asyncio.to_thread(cache.put, key, mcqs)
+    if doc_id and not info["fallback"]:
+        # padding is appended last; only the LLM's questions go to the bank
+        await asyncio.to_thread(db.store_questions, doc_id, mcqs[:len(mcqs) - info["padded"]])
+    return mcqs, {"cached": False, "padded": info["padded"], "fallback": info["fallback"]}
+
+
+async def _run_generation_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    scheduler.current_tenant.set(job.get("tenant") or "__anon__")
+    text = await asyncio.to_thread(db.get_document_text, job["doc_id"])
+    if text is None:
+        raise ValueError("doc_id not found")
+    mcqs, _ = await _generate_for_text(text, job["num_questions"], doc_id=job["doc_id"])
+    return {"doc_id": job["doc_id"], "mcqs": mcqs}
+
+
+@app.post("/generate")
+async def generate_mcqs(
+    req: GenerateRequest,
+    async_: bool = Query(False, alias="async"),
+    fresh: bool = False,
+    _auth=Depends(rate_limit_dependency),
+):
+    """Generate MCQs for a document.
+
+    With `?async=1` the request is queued as a job and a `job_id` is returned
+    immediately (202); poll `GET /jobs/{job_id}` for the result.
+    Results are cached per document text, model and count; `?fresh=1` bypasses the cache.
+    """
+    scheduler.current_tenant.set(_auth)
+    text = await asyncio.to_thread(db.get_document_text, req.doc_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="doc_id not found")
+
+    if async_:
+        job_id = str(uuid.uuid4())
+        await asyncio.to_thread(db.create_job, job_id, req.doc_id, req.num_questions, tenant=_auth)
+        jobs.start_workers(_run_generation_job)
+        jobs.notify()
+        return JSONResponse({"job_id": job_id, "status": "queued"}, status_code=202, headers={"Location": f"/jobs/{job_id}"})
+
+    mcqs, meta = await _generate_for_text(text, req.num_questions, fresh=fresh, doc_id=req.doc_id)
+
+    return JSONResponse({"doc_id": req.doc_id, "mcqs": mcqs, "cached": meta["cached"]})
+
 
-    return JSONResponse({"doc_id": req.doc_id, "mcqs": mcqs})
+@app.post("/generate/batch")
+async def generate_batch(reqs: List[GenerateRequest], fresh: bool = False, _auth=Depends(rate_limit_dependency)):
+    """Generate MCQs for many documents at once, streamed back as NDJSON.
+
+    Items run concurrently (at most BATCH_CONCURRENCY per batch, and all LLM
+    calls share the process-wide LLM limit). Each line is written as soon as
+    its item finishes: `{"index", "doc_id", "mcqs", "cached", "fallback"}`,
+    plus `error` for unknown documents or failed items. A failing item falls
+    back to the dummy generator without failing the batch.
+    """
+    if len(reqs) > _BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {_BATCH_MAX_ITEMS} items per batch")
+    scheduler.current_tenant.set(_auth)
+    limit = asyncio.Semaphore(max(_BATCH_CONCURRENCY, 1))
+
+    async def _one(index: int, req: GenerateRequest) -> Dict[str, Any]:
+        async with limit:
+            item: Dict[str, Any] = {"index": index, "doc_id": req.doc_id}
+            text = await asyncio.to_thread(db.get_document_text, req.doc_id)
+            if text is None:
+                item.update({"mcqs": [], "error": "doc_id not found"})
+                return item
+            try:
+                mcqs, meta = await _generate_for_text(text, req.num_questions, fresh=fresh, doc_id=req.doc_id)
+                item.update({"mcqs": mcqs, "cached": meta["cached"], "fallback": meta["fallback"]})
+            except Exception as e:
+                metrics.DUMMY_FALLBACKS.inc("full")
+                item.update({"mcqs": await _dummy_mcqs(text, req.num_questions, req.doc_id), "cached": False, "fallback": True, "error": str(e)})
+            return item
+
+    async def _stream():
+        tasks = [asyncio.create_task(_one(i, r)) for i, r in enumerate(reqs)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # client went away (or we are done): stop any remaining work
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest, fresh: bool = False, _auth=Depends(rate_limit_dependency)):
+    """Generate MCQs for a document as server-sent events.
+
+    Each question is sent as an `mcq` event as soon as it has been parsed
+    from the model output and validated against MCQItem. A final `done`
+    event reports `count`, `cached`, `fallback` (the dummy generator produced
+    the set) and `padded` (dummy questions appended to reach num_questions).
+    If the model stream fails, an `error` event with the `count` sent so far
+    ends the stream instead. Documents large enough to be chunked are generated first and then sent.
+    """
+    scheduler.current_tenant.set(_auth)
+    text = await asyncio.to_thread(db.get_document_text, req.doc_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="doc_id not found")
+    n = req.num_questions
+
+    async def _events():
+        sent: List[Dict[str, Any]] = []
+        done: Dict[str, Any] = {"cached": False, "fallback": False, "padded": 0, "invalid": 0}
+
+        def _mcq(item):
+            sent.append(item)
+            return sse_event("mcq", dict(item, index=len(sent) - 1))
+
+        key = cache.make_key(text, os.getenv("MODEL", "gpt-4o-mini"), n, PROMPT_VERSION)
+        hit = None if fresh else await asyncio.to_thread(cache.get, key)
+        if hit is None and not fresh:
+            hit = await _banked_mcqs(req.doc_id, n)
+        if hit is not None:
+            done["cached"] = True
+            for item in hit:
+                yield _mcq(item)
+        elif not os.getenv("OPENAI_API_KEY") or chunking.estimate_tokens(text) > _CHUNK_TOKENS:
+            mcqs, meta = await _generate_for_text(text, n, fresh=True, doc_id=req.doc_id)
+            done.update(fallback=meta["fallback"], padded=meta["padded"])
+            for item in mcqs:
+                yield _mcq(item)
+        else:
+            _openai().api_key = os.getenv("OPENAI_API_KEY")
+            parser = MCQStreamParser()
+            deduper = dedup.Deduper()
+            user = "Document:\n" + text + "\n\n" + f"Generate {n} MCQs."
+            try:
+                async for piece in _chat_completion_stream(
+                    [{"role": "system", "content": _SYSTEM_PROMPT}, {"role": "user", "content": user}],
+                    temperature=0.2,
+                ):
+                    for obj in parser.feed(piece):
+                        if len(sent) >= n:
+                            continue
+                        try:
+                            item = validate_mcqs([obj])[0]
+                        except ValueError:
+                            done["invalid"] += 1
+                            continue
+                        if deduper.add(item["question"]):
+                            yield _mcq(item)
+            except Exception:
+                logger.exception("streamed generation for document %s failed", req.doc_id)
+                yield sse_event("error", {"detail": "Generation failed", "count": len(sent)})
+                return
+            if not sent:
+                # nothing usable streamed: use the regular retry/recovery path
+                validated = await _llm_generate_validated(text, n)
+                if validated is None:
+                    done["fallback"] = True
+                    metrics.DUMMY_FALLBACKS.inc("full")
+                    validated = await _dummy_mcqs(text, n, req.doc_id)
+                else:
+                    validated = dedup.dedupe_mcqs(validated, deduper=deduper)
+                for item in validated[:n]:
+                    yield _mcq(item)
+            if deduper.dropped and len(sent) < n and not done["fallback"]:
+                for item in await _refill_duplicates(text, [text], [m["question"] for m in sent], n - len(sent), deduper):
+                    yield _mcq(item)
+            metrics.DUPLICATES_DROPPED.inc(amount=deduper.dropped)
+            if not done["fallback"]:
+                await asyncio.to_thread(db.store_questions, req.doc_id, sent)
+            if len(sent) < n:
+                done["padded"] = n - len(sent)
+                metrics.DUMMY_FALLBACKS.inc("padded")
+                for item in await _dummy_mcqs(text, n - len(sent), req.doc_id, deduper):
+                    yield _mcq(item)
+            elif not done["fallback"]:
+                await asyncio.to_thread(cache.put, key, sent)
+        done["count"] = len(sent)
+        yield sse_event("done", done)
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/cache/stats")
+async def cache_stats(_auth=Depends(require_api_key)):
+    """Return MCQ cache hit/miss counters."""
+    return JSONResponse(cache.stats())
+
+
+@app.get("/usage")
+async def llm_usage(api_key: Optional[str] = Depends(require_api_key)):
+    """Return the caller's LLM usage: calls, prompt tokens charged and time spent queued."""
+    key = api_key or "__anon__"
+    usage = _llm_scheduler.stats(key)
+    return JSONResponse({"tokens_per_min": _llm_scheduler.tokens_per_min, **usage})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, _auth=Depends(require_api_key)):
+    """Return the status of a generation job and, once done, its MCQs."""
+    job = await asyncio.to_thread(db.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job_id not found")
+    body: Dict[str, Any] = {"job_id": job["id"], "doc_id": job["doc_id"], "status": job["status"]}
+    if job["status"] == "done":
+        body["mcqs"] = (job["result"] or {}).get("mcqs", [])
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+    return JSONResponse(body)
 
 
 @app.get("/documents")
-async def list_documents(q: Optional[str] = None, limit: int = 20, offset: int = 0, _auth=Depends(require_api_key)):
+async def list_documents(
+    q: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    _auth=Depends(require_api_key),
+):
     """Return a list of stored documents (id, filename, uploaded_at).
 
-    Supports optional query `q` (search filename/text), `limit`, and `offset` for pagination.
+    Supports optional query `q` (full-text search over filename/text, ranked,
+    with a `snippet` per match), `limit`, and `offset` for pagination.
+    Without `q` the response carries a `next_cursor`; pass it back as
+    `cursor` for keyset pagination (preferred over `offset` for deep pages).
     """
-    docs = db.list_documents(limit=limit, offset=offset, q=q)
-    return JSONResponse({"documents": docs})
+    limit = max(limit, 0)
+    try:
+        # one extra row tells us whether another page exists
+        docs = await asyncio.to_thread(db.list_documents, limit=limit + 1, offset=offset, q=q, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    next_cursor = db.encode_cursor(docs[limit - 1]) if limit and len(docs) > limit and not q else None
+    return JSONResponse({"documents": docs[:limit], "next_cursor": next_cursor})
+
+
+# Most questions listed in the prompt when topping up a document's question bank
+_QUIZ_AVOID_MAX = int(os.getenv("QUIZ_AVOID_MAX", "50"))
+
+
+@app.get("/documents/{doc_id}/quiz")
+async def get_quiz(
+    doc_id: str,
+    n: int = Query(5, ge=1, le=100),
+    seed: Optional[int] = None,
+    _auth=Depends(rate_limit_dependency),
+):
+    """Serve a quiz of `n` questions sampled from the document's question bank.
+
+    Every validated question generated for the document is banked, and a
+    quiz is `n` of them sampled with `seed` (random when omitted, and
+    returned). The same seed gives the same quiz for as long as the bank is
+    unchanged. The LLM is only called when the bank holds fewer than `n`
+    questions; it is asked for the missing ones, avoiding those already
+    banked. Returns `{"doc_id", "seed", "mcqs", "generated"}` where
+    `generated` counts questions added to the bank for this quiz.
+    """
+    scheduler.current_tenant.set(_auth)
+    text = await asyncio.to_thread(db.get_document_text, doc_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="doc_id not found")
+    if seed is None:
+        seed = random.randrange(2**31)
+
+    await _pregen.settle(doc_id)
+    banked = await asyncio.to_thread(db.get_questions, doc_id)
+    generated = 0
+    if len(banked) < n:
+        try:
+            mcqs, info = await _call_openai_generate_detailed(
+                text, n - len(banked), doc_id, avoid=[q["question"] for q in banked[-_QUIZ_AVOID_MAX:]]
+            )
+        except Exception:
+            info = {"fallback": True}
+        if not info["fallback"]:
+            generated = await asyncio.to_thread(db.store_questions, doc_id, mcqs[:len(mcqs) - info["padded"]])
+            banked = await asyncio.to_thread(db.get_questions, doc_id)
+
+    quiz = [
+        {k: q[k] for k in ("question", "options", "answer_index")}
+        for q in random.Random(seed).sample(banked, min(n, len(banked)))
+    ]
+    quiz = await _pad_with_dummies(text, quiz, n, {}, doc_id)
+    return JSONResponse({"doc_id": doc_id, "seed": seed, "mcqs": quiz, "generated": generated})
+
+
+@app.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str, _auth=Depends(require_api_key)):
+    """Delete a document: its metadata, search entry, question bank and any
+    pre-generation still in progress. Text and uploaded file shared with a
+    deduplicated upload are kept until that one is deleted too."""
+    cancelled = _pregen.cancel(doc_id)
+    deleted = await asyncio.to_thread(db.delete_document, doc_id)
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="doc_id not found")
+    path = deleted["upload_path"]
+    if deleted["upload_orphaned"] and path and os.path.exists(path):
+        os.remove(path)
+    return JSONResponse({"doc_id": doc_id, "deleted": True, "pregen_cancelled": cancelled})
 
 
 @app.get("/files/{doc_id}")
@@ -315,7 +1175,7 @@ async def get_uploaded_file(doc_id: str, _auth=Depends(require_api_key)):
 
     Returns 404 if no such document or the file is missing.
     """
-    doc = db.get_document(doc_id)
+    doc = await asyncio.to_thread(db.get_document, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="doc_id not found")
     upload_path = doc.get("upload_path")
@@ -325,6 +1185,12 @@ async def get_uploaded_file(doc_id: str, _auth=Depends(require_api_key)):
     return FileResponse(path=upload_path, filename=doc.get("filename"), media_type="application/octet-stream")
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics for this process (latency histograms and counters)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 def health():
     return JSONResponse({"status": "ok"})
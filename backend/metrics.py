@@ -0,0 +1,182 @@
+"""In-process metrics, rendered in the Prometheus text format by GET /metrics.
+
+Counters and histograms keep one table per thread, written without locks
+(only the owning thread writes it), and the tables are summed when
+`render` is called. Recording costs a dict lookup and an add, so the hot
+paths can be instrumented freely.
+
+Numbers are per process and nothing is shared between processes: every
+sample carries a `pid` label naming the process that produced it. With
+several workers (`uvicorn --workers N`) behind one port, each scrape
+reaches whichever worker accepts it, so a scrape covers one worker only.
+Scrape each process on its own address (e.g. one single-worker uvicorn
+per port) and aggregate in queries with `sum without (pid) (...)`.
+"""
+
+import os
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds; LLM calls reach well past the defaults
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    # looked up on each render: a forked worker must not report its parent's pid
+    parts.append(f'pid="{os.getpid()}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}"
+
+
+def _num(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional[List["_Metric"]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._tables: List[dict] = []
+        self._tables_lock = threading.Lock()
+        (_registry if registry is None else registry).append(self)
+
+    def _table(self) -> dict:
+        try:
+            return self._local.table
+        except AttributeError:
+            table: dict = {}
+            with self._tables_lock:
+                self._tables.append(table)
+            self._local.table = table
+            return table
+
+    def _snapshot(self) -> List[Tuple[tuple, object]]:
+        with self._tables_lock:
+            tables = list(self._tables)
+        # list(dict.items()) runs under the GIL, so it is safe against the owner writing
+        return [item for table in tables for item in list(table.items())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        table = self._table()
+        table[labels] = table.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return sum(v for k, v in self._snapshot() if k == labels)
+
+    def render(self) -> List[str]:
+        totals: Dict[tuple, float] = {}
+        for key, v in self._snapshot():
+            totals[key] = totals.get(key, 0.0) + v
+        lines = super().render()
+        for key in sorted(totals):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_num(totals[key])}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Optional[List["_Metric"]] = None):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        table = self._table()
+        cell = table.get(labels)
+        if cell is None:
+            # one slot per bucket, one for +Inf, then the sum
+            cell = table[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        return sum(sum(cell[:-1]) for k, cell in self._snapshot() if k == labels)
+
+    def render(self) -> List[str]:
+        merged: Dict[tuple, list] = {}
+        for key, cell in self._snapshot():
+            cell = list(cell)
+            acc = merged.get(key)
+            merged[key] = cell if acc is None else [a + b for a, b in zip(acc, cell)]
+        lines = super().render()
+        for key in sorted(merged):
+            cell = merged[key]
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), cell):
+                running += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(cell[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+def render(registry: Optional[List[_Metric]] = None) -> str:
+    """All metrics of `registry` (default: the application's) in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry if registry is None else registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, label: str):
+    """Decorator: observe each call's duration in `histogram` under `label`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, label)
+        return inner
+    return wrap
+
+
+# -- application metrics ------------------------------------------------------
+
+REQUEST_SECONDS = Histogram("quizgen_request_seconds", "HTTP request handling time (to response start).", ("method", "route", "status"))
+UPLOAD_SAVE_SECONDS = Histogram("quizgen_upload_save_seconds", "Time to stream and hash an upload to disk.")
+EXTRACTION_SECONDS = Histogram("quizgen_extraction_seconds", "Text extraction time per upload.", ("type",))
+DB_CALL_SECONDS = Histogram("quizgen_db_call_seconds", "Time spent in db.py calls.", ("op",))
+LLM_CALL_SECONDS = Histogram("quizgen_llm_call_seconds", "LLM chat completion time.", ("outcome",), buckets=LLM_BUCKETS)
+LLM_RETRIES = Counter("quizgen_llm_retries_total", "Generation attempts after the first one failed.")
+LLM_RECOVERY_PROMPTS = Counter("quizgen_llm_recovery_prompts_total", "JSON-only recovery prompts sent after an unusable response.")
+DUMMY_FALLBACKS = Counter("quizgen_dummy_fallbacks_total", "Question sets produced (full) or topped up (padded) by the dummy generator.", ("kind",))
+RATE_LIMIT_REJECTIONS = Counter("quizgen_rate_limit_rejections_total", "Requests rejected with 429 by the rate limiter.")
+DUPLICATES_DROPPED = Counter("quizgen_mcq_duplicates_dropped_total", "Generated questions dropped as near-duplicates of another in the set.")
+PREGEN_RUNS = Counter("quizgen_pregen_total", "Background question pre-generation runs by outcome.", ("outcome",))
+CACHE_LOOKUPS = Counter("quizgen_mcq_cache_lookups_total", "MCQ cache lookups by result.", ("result",))
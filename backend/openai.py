@@ -2,12 +2,64 @@
 Lightweight shim for the OpenAI client so tests and local runs don't fail if
 the real `openai` package isn't installed in the interpreter used by pytest.
 
-This shim defines the minimal attributes used by the code (ChatCompletion.create
-and api_key). In production, the real `openai` package will shadow this if
-installed in site-packages; when running tests we monkeypatch ChatCompletion.create
-so this shim is sufficient.
+This shim defines the minimal attributes used by the code (ChatCompletion.create,
+ChatCompletion.acreate and api_key). In production, the real `openai` package will
+shadow this if installed in site-packages; when running tests we monkeypatch
+ChatCompletion.create (or acreate) so this shim is sufficient.
+
+When OPENAI_API_BASE is set (e.g. to the fake server in scripts/fake_llm.py),
+`acreate` posts to that OpenAI-compatible `/chat/completions` endpoint instead.
 """
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
 api_key = None
+api_base = os.getenv("OPENAI_API_BASE")
+
+
+def _to_obj(value):
+    # attribute access like the real client; stream deltas stay dicts
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: (v if k == "delta" else _to_obj(v)) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_obj(v) for v in value]
+    return value
+
+
+async def _stream_chunks(client, response):
+    try:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            yield _to_obj(json.loads(data))
+    finally:
+        await response.aclose()
+        await client.aclose()
+
+
+async def _http_create(**kwargs):
+    import httpx
+
+    url = api_base.rstrip("/") + "/chat/completions"
+    headers = {"Authorization": f"Bearer {api_key or ''}"}
+    client = httpx.AsyncClient(timeout=None)
+    if kwargs.get("stream"):
+        request = client.build_request("POST", url, json=kwargs, headers=headers)
+        response = await client.send(request, stream=True)
+        if response.status_code >= 400:
+            await response.aread()
+            await client.aclose()
+            response.raise_for_status()
+        return _stream_chunks(client, response)
+    async with client:
+        response = await client.post(url, json=kwargs, headers=headers)
+        response.raise_for_status()
+        return _to_obj(response.json())
 
 
 class ChatCompletion:
@@ -15,5 +67,13 @@ class ChatCompletion:
     def create(*args, **kwargs):
         raise RuntimeError("openai package not available; tests should monkeypatch this method")
 
+    @staticmethod
+    async def acreate(*args, **kwargs):
+        if api_base:
+            return await _http_create(**kwargs)
+        # Delegate to `create` in a thread so tests that only patch `create`
+        # also exercise the async code path.
+        return await asyncio.to_thread(ChatCompletion.create, *args, **kwargs)
+
 
-__all__ = ["api_key", "ChatCompletion"]
+__all__ = ["api_key", "api_base", "ChatCompletion"]
@@ -0,0 +1,180 @@
+"""Background question pre-generation for new uploads.
+
+After an upload is stored, the app submits the document here and a task
+generates questions into its question bank (see db.store_questions), so
+the first /generate or quiz request can be served without waiting on the
+LLM. Tasks run at most PREGEN_CONCURRENCY at a time per process and mark
+their LLM calls as background work, so the scheduler serves interactive
+requests first. Deleting the document cancels its task.
+
+A request for a document whose task has not reached the LLM yet cancels
+it rather than wait behind interactive work at background priority; one
+whose task is already calling the LLM waits for it, but at most
+PREGEN_SETTLE_TIMEOUT seconds.
+
+Tasks live in this process only: pre-generation cut short by a restart is
+not resumed, and the first request for that document generates as usual.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+try:
+    from . import metrics, scheduler
+except Exception:
+    import metrics
+    import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Pre-generate questions after upload (off by default: it spends LLM tokens on
+# documents nobody may ask about)
+PREGEN_ENABLED = os.getenv("PREGEN_ENABLED", "0") == "1"
+# Questions prepared per document, and documents prepared at once per process
+PREGEN_QUESTIONS = int(os.getenv("PREGEN_QUESTIONS", "10"))
+PREGEN_CONCURRENCY = int(os.getenv("PREGEN_CONCURRENCY", "1"))
+# Documents waiting for a pre-generation slot per process; uploads beyond it
+# are not pre-generated (their first request generates as usual)
+PREGEN_QUEUE_MAX = int(os.getenv("PREGEN_QUEUE_MAX", "100"))
+# Per-tenant question counts overriding PREGEN_QUESTIONS, e.g. "key-a=20,key-b=0"
+# (0 turns pre-generation off for that API key; "__anon__" is the keyless tenant)
+PREGEN_TENANTS = os.getenv("PREGEN_TENANTS", "")
+# Longest a request waits for a document's in-progress pre-generation before
+# generating on its own (seconds)
+PREGEN_SETTLE_TIMEOUT = float(os.getenv("PREGEN_SETTLE_TIMEOUT", "30"))
+
+# (doc_id, n) -> coroutine that generates and banks n questions for the document
+PregenHandler = Callable[[str, int], Awaitable[None]]
+
+
+def parse_tenant_counts(spec: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for part in spec.split(","):
+        key, sep, value = part.strip().rpartition("=")
+        if sep and key.strip() and value.strip().isdigit():
+            counts[key.strip()] = int(value)
+    return counts
+
+
+class Pregenerator:
+    def __init__(self, handler: PregenHandler, concurrency: int = PREGEN_CONCURRENCY,
+                 enabled: bool = PREGEN_ENABLED, questions: int = PREGEN_QUESTIONS,
+                 tenants: Optional[Dict[str, int]] = None, settle_timeout: float = PREGEN_SETTLE_TIMEOUT,
+                 queue_max: int = PREGEN_QUEUE_MAX):
+        self.handler = handler
+        self.concurrency = max(concurrency, 1)
+        self.enabled = enabled
+        self.questions = questions
+        self.tenants = parse_tenant_counts(PREGEN_TENANTS) if tenants is None else tenants
+        self.settle_timeout = settle_timeout
+        self.queue_max = max(queue_max, 0)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # documents whose task holds a slot (is generating, not just queued)
+        self._running: Set[str] = set()
+        # documents whose task has had an LLM call start (see scheduler.on_slot)
+        self._calling: Set[str] = set()
+        # latest task per group of identical documents (see submit)
+        self._groups: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def questions_for(self, tenant: str) -> int:
+        """Questions to prepare for an upload by `tenant` (0 = none)."""
+        if not self.enabled:
+            return 0
+        return max(self.tenants.get(tenant, self.questions), 0)
+
+    def submit(self, doc_id: str, tenant: str, group: Optional[str] = None) -> bool:
+        """Queue pre-generation for a new document; returns False if it is off
+        for this tenant or the queue is full.
+
+        Documents with the same `group` (e.g. deduplicated uploads of one
+        file) are prepared one after another, so each can reuse what the
+        previous one generated instead of calling the LLM again.
+        """
+        n = self.questions_for(tenant)
+        if n <= 0:
+            return False
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # semaphores and tasks belong to one loop
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._tasks.clear()
+            self._running.clear()
+            self._calling.clear()
+            self._groups.clear()
+        if self.pending() - len(self._running) >= self.queue_max:
+            metrics.PREGEN_RUNS.inc("dropped")
+            return False
+        previous = self._groups.get(group) if group is not None else None
+        task = loop.create_task(self._run(doc_id, tenant, n, previous))
+        self._tasks[doc_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(doc_id, None) if self._tasks.get(doc_id) is t else None)
+        if group is not None:
+            self._groups[group] = task
+            task.add_done_callback(lambda t: self._groups.pop(group, None) if self._groups.get(group) is t else None)
+        return True
+
+    async def _run(self, doc_id: str, tenant: str, n: int, previous: Optional[asyncio.Task] = None) -> None:
+        # the task has its own context, so these do not leak to the caller
+        scheduler.current_tenant.set(tenant)
+        scheduler.background.set(True)
+        scheduler.on_slot.set(lambda: self._calling.add(doc_id))
+        try:
+            if previous is not None:
+                # asyncio.wait neither raises the previous task's errors nor
+                # passes our cancellation on to it
+                await asyncio.wait({previous})
+            async with self._slots:
+                self._running.add(doc_id)
+                try:
+                    await self.handler(doc_id, n)
+                finally:
+                    self._running.discard(doc_id)
+                    self._calling.discard(doc_id)
+        except asyncio.CancelledError:
+            metrics.PREGEN_RUNS.inc("cancelled")
+            raise
+        except Exception:
+            logger.exception("pre-generation for document %s failed", doc_id)
+            metrics.PREGEN_RUNS.inc("failed")
+        else:
+            metrics.PREGEN_RUNS.inc("done")
+
+    def cancel(self, doc_id: str) -> bool:
+        """Cancel the document's pre-generation if it is queued or running."""
+        task = self._tasks.pop(doc_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def running(self, doc_id: str) -> bool:
+        return doc_id in self._running
+
+    def pending(self) -> int:
+        return sum(not t.done() for t in self._tasks.values())
+
+    async def settle(self, doc_id: str) -> None:
+        """Before serving a request for the document: wait (up to
+        `settle_timeout`) for its pre-generation if an LLM call of it has
+        started, or cancel it if it is still queued for a slot (the request
+        is about to generate anyway)."""
+        task = self._tasks.get(doc_id)
+        if task is None or task.done():
+            return
+        if doc_id in self._calling:
+            # asyncio.wait neither cancels the task on timeout nor raises its errors
+            await asyncio.wait({task}, timeout=self.settle_timeout)
+        else:
+            self.cancel(doc_id)
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
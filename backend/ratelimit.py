@@ -0,0 +1,142 @@
+"""Per-key token-bucket rate limiting.
+
+Two backends, picked with RATE_LIMIT_BACKEND:
+
+- "memory" (default): `TokenBucketLimiter`, buckets in this process only.
+  Buckets are spread over lock shards chosen by key hash, so requests for
+  different keys rarely contend, and each check refills and consumes in a
+  single critical section.
+- "sqlite": `SQLiteLimiter`, buckets in the app database, shared by every
+  worker process and replica on the host and kept across restarts.
+
+Either way, buckets left idle longer than the TTL are swept out, so the
+table does not grow with every key ever seen.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+
+try:
+    from . import db
+except Exception:
+    import db
+
+# Where buckets live: "memory" (per process) or "sqlite" (shared via the app DB)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+# Lock shards for the bucket table and how long (seconds) an idle bucket is kept
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+RATE_LIMIT_IDLE_TTL = float(os.getenv("RATE_LIMIT_IDLE_TTL", "300"))
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [tokens, last_refill]
+        self.buckets: Dict[str, List[float]] = {}
+
+
+class TokenBucketLimiter:
+    """Allow `rate_per_min` requests per minute per key, with bursts up to the same amount."""
+
+    def __init__(self, rate_per_min: int, shards: int = RATE_LIMIT_SHARDS, idle_ttl: float = RATE_LIMIT_IDLE_TTL):
+        self.capacity = float(rate_per_min)
+        self.rate = rate_per_min / 60.0
+        # An evicted bucket comes back full, so only drop buckets that have
+        # been idle long enough to have refilled completely anyway.
+        self.idle_ttl = max(idle_ttl, 60.0)
+        self._shards = [_Shard() for _ in range(max(shards, 1))]
+        # One deadline for the whole limiter: the check that passes it sweeps
+        # every shard, so an idle key is evicted whichever shard it hashed to.
+        # 0.0 makes the first check schedule it on the caller's clock.
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def consume(self, key: str, now: Optional[float] = None) -> bool:
+        """Take one token from `key`'s bucket; False if it is empty."""
+        if now is None:
+            now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep_all(now)
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            b = shard.buckets.get(key)
+            if b is None:
+                shard.buckets[key] = [self.capacity - 1.0, now]
+                return self.capacity >= 1.0
+            tokens = min(self.capacity, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+            if tokens >= 1.0:
+                b[0] = tokens - 1.0
+                return True
+            b[0] = tokens
+            return False
+
+    def _sweep_all(self, now: float) -> None:
+        # one thread sweeps, the others carry on; amortised over the TTL
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.idle_ttl / 2
+            cutoff = now - self.idle_ttl
+            for shard in self._shards:
+                with shard.lock:
+                    stale = [k for k, b in shard.buckets.items() if b[1] < cutoff]
+                    for k in stale:
+                        del shard.buckets[k]
+        finally:
+            self._sweep_lock.release()
+
+    def evict_idle(self, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        with self._sweep_lock:
+            self._next_sweep = 0.0
+        self._sweep_all(now)
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+
+class SQLiteLimiter:
+    """Token buckets in the `rate_limits` table, shared across processes.
+
+    Each check is one atomic upsert on the pooled WAL connection (see
+    `db.rate_limit_consume`), which stays well under a millisecond.
+    """
+
+    def __init__(self, rate_per_min: int, idle_ttl: float = RATE_LIMIT_IDLE_TTL):
+        self.capacity = float(rate_per_min)
+        self.rate = rate_per_min / 60.0
+        self.idle_ttl = max(idle_ttl, 60.0)
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.time() + self.idle_ttl / 2
+
+    def consume(self, key: str, now: Optional[float] = None) -> bool:
+        """Take one token from `key`'s bucket; False if it is empty."""
+        if now is None:
+            now = time.time()
+        if now >= self._next_sweep and self._sweep_lock.acquire(blocking=False):
+            try:
+                self._next_sweep = now + self.idle_ttl / 2
+                db.rate_limit_evict(now - self.idle_ttl)
+            finally:
+                self._sweep_lock.release()
+        return db.rate_limit_consume(key, self.capacity, self.rate, now)
+
+    def evict_idle(self, now: Optional[float] = None) -> None:
+        db.rate_limit_evict((time.time() if now is None else now) - self.idle_ttl)
+
+
+def make_limiter(rate_per_min: int, backend: str = RATE_LIMIT_BACKEND):
+    """Build the limiter for `backend` ("memory" or "sqlite")."""
+    if backend == "sqlite":
+        return SQLiteLimiter(rate_per_min)
+    if backend != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend!r}")
+    return TokenBucketLimiter(rate_per_min)
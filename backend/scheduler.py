@@ -0,0 +1,267 @@
+"""Fair scheduling of LLM calls across tenants (API keys).
+
+Every chat completion asks the scheduler for a slot, charging the estimated
+prompt tokens to the calling tenant. A call starts when
+
+- fewer than LLM_CONCURRENCY calls are in flight in this process, and
+- the tenant's tokens-per-minute budget (LLM_TENANT_TPM) can cover it.
+
+Waiting calls are queued per tenant and served by weighted round-robin
+(LLM_TENANT_WEIGHTS), so one tenant with a backlog of large documents
+cannot starve the others. Background calls (see `background`) queue
+separately: they only get a slot no interactive call is waiting for, and
+never the last free one (unless LLM_CONCURRENCY is 1). Per-tenant usage (tokens charged, queue wait) is
+kept for `stats`.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Optional
+
+# Tokens each tenant may be charged per minute (0 = unlimited). A single call
+# larger than the whole budget runs once the budget is full, leaving it in debt.
+LLM_TENANT_TPM = int(os.getenv("LLM_TENANT_TPM", "0"))
+# Round-robin weights, e.g. "key-a=3,key-b=2"; unlisted tenants get 1
+LLM_TENANT_WEIGHTS = os.getenv("LLM_TENANT_WEIGHTS", "")
+
+# Tenant the current request is running for; endpoints set it from the API key
+current_tenant: ContextVar[str] = ContextVar("llm_tenant", default="__anon__")
+# True while running work nobody is waiting on (e.g. pre-generation); such
+# calls yield to interactive ones
+background: ContextVar[bool] = ContextVar("llm_background", default=False)
+# Called each time a call in this context gets its slot, i.e. actually starts
+on_slot: ContextVar[Optional[Callable[[], None]]] = ContextVar("llm_on_slot", default=None)
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    weights: Dict[str, int] = {}
+    for part in spec.split(","):
+        key, sep, value = part.strip().rpartition("=")
+        if sep and key.strip() and value.strip().isdigit():
+            weights[key.strip()] = max(int(value), 1)
+    return weights
+
+
+def _blank_usage() -> Dict[str, float]:
+    return {"calls": 0, "tokens_charged": 0, "queue_wait_seconds": 0.0, "max_queue_wait_seconds": 0.0}
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "enqueued", "tenant")
+
+    def __init__(self, future: asyncio.Future, tokens: int, enqueued: float, tenant: str = ""):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued = enqueued
+        self.tenant = tenant
+
+
+class LLMScheduler:
+    def __init__(self, max_inflight: int, tokens_per_min: int = LLM_TENANT_TPM, weights: Optional[Dict[str, int]] = None):
+        self.max_inflight = max(max_inflight, 1)
+        # background calls leave one slot free for interactive ones
+        self.max_background = max(self.max_inflight - 1, 1)
+        self.tokens_per_min = tokens_per_min
+        self.weights = weights or {}
+        # budgets and usage outlive any one event loop; queues do not
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, list] = {}  # tenant -> [tokens, last_refill]
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset_queues()
+
+    def _reset_queues(self) -> None:
+        self._inflight = 0
+        self._background_inflight = 0
+        self._background: Deque[_Waiter] = deque()  # background waiters, FIFO
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._ring: Deque[str] = deque()  # tenants with waiters, in service order
+        self._credits: Dict[str, int] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    # -- budgets -------------------------------------------------------------
+
+    def _budget_level(self, tenant: str, now: float) -> float:
+        b = self._budgets.get(tenant)
+        cap = float(self.tokens_per_min)
+        if b is None:
+            b = self._budgets[tenant] = [cap, now]
+        b[0] = min(cap, b[0] + (now - b[1]) * cap / 60.0)
+        b[1] = now
+        return b[0]
+
+    def _wait_for_budget(self, tenant: str, tokens: int, now: float) -> float:
+        """Seconds until `tenant` can afford `tokens` (0 if it can now)."""
+        if self.tokens_per_min <= 0:
+            return 0.0
+        need = min(float(tokens), float(self.tokens_per_min))
+        level = self._budget_level(tenant, now)
+        if level >= need:
+            return 0.0
+        return (need - level) * 60.0 / self.tokens_per_min
+
+    def _charge(self, tenant: str, tokens: int, waited: float) -> None:
+        if self.tokens_per_min > 0:
+            self._budgets[tenant][0] -= tokens
+        with self._lock:
+            u = self._usage.setdefault(tenant, _blank_usage())
+            u["calls"] += 1
+            u["tokens_charged"] += tokens
+            u["queue_wait_seconds"] += waited
+            u["max_queue_wait_seconds"] = max(u["max_queue_wait_seconds"], waited)
+
+    # -- queueing ------------------------------------------------------------
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, tenant: Optional[str] = None):
+        """Hold one in-flight LLM slot for `tenant`, charged `tokens`."""
+        low = background.get()
+        await self.acquire(tokens, tenant, low)
+        try:
+            started = on_slot.get()
+            if started is not None:
+                started()
+            yield
+        finally:
+            self.release(low)
+
+    async def acquire(self, tokens: int, tenant: Optional[str] = None, low: bool = False) -> None:
+        tenant = tenant or current_tenant.get()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # asyncio futures are bound to one loop; start over on a new one
+            self._loop = loop
+            self._reset_queues()
+        now = time.monotonic()
+        if low:
+            if self._background_free() and not self._background and self._wait_for_budget(tenant, tokens, now) == 0.0:
+                self._start(tenant, tokens, 0.0, low=True)
+                return
+        elif self._inflight < self.max_inflight and not self._ring and self._wait_for_budget(tenant, tokens, now) == 0.0:
+            self._start(tenant, tokens, 0.0)
+            return
+        waiter = _Waiter(loop.create_future(), tokens, now, tenant)
+        if low:
+            self._background.append(waiter)
+        else:
+            if tenant not in self._queues:
+                self._queues[tenant] = deque()
+                self._ring.append(tenant)
+                self._credits[tenant] = self.weights.get(tenant, 1)
+            self._queues[tenant].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # granted just as we were cancelled: hand the slot back
+                self.release(low)
+            elif low:
+                if waiter in self._background:
+                    self._background.remove(waiter)
+                self._dispatch()
+            else:
+                self._remove(tenant, waiter)
+            raise
+
+    def release(self, low: bool = False) -> None:
+        self._inflight -= 1
+        if low:
+            self._background_inflight -= 1
+        self._dispatch()
+
+    def _background_free(self) -> bool:
+        return (
+            not self._ring
+            and self._inflight < self.max_inflight
+            and self._background_inflight < self.max_background
+        )
+
+    def _start(self, tenant: str, tokens: int, waited: float, low: bool = False) -> None:
+        self._inflight += 1
+        if low:
+            self._background_inflight += 1
+        self._charge(tenant, tokens, waited)
+
+    def _remove(self, tenant: str, waiter: _Waiter) -> None:
+        queue = self._queues.get(tenant)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                self._drop(tenant)
+        self._dispatch()
+
+    def _drop(self, tenant: str) -> None:
+        del self._queues[tenant]
+        del self._credits[tenant]
+        self._ring.remove(tenant)
+
+    def _dispatch(self) -> None:
+        """Start queued calls while slots are free, in weighted round-robin order."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        soonest: Optional[float] = None
+        skipped = 0
+        while self._inflight < self.max_inflight and self._ring and skipped < len(self._ring):
+            tenant = self._ring[0]
+            queue = self._queues[tenant]
+            waiter = queue[0]
+            if waiter.future.done():
+                # cancelled while queued; its task cleans up, skip it here
+                queue.popleft()
+                if not queue:
+                    self._drop(tenant)
+                continue
+            delay = self._wait_for_budget(tenant, waiter.tokens, now)
+            if delay > 0:
+                # over budget: let the next tenant go, look again once it refills
+                soonest = delay if soonest is None else min(soonest, delay)
+                self._ring.rotate(-1)
+                skipped += 1
+                continue
+            skipped = 0
+            queue.popleft()
+            self._start(tenant, waiter.tokens, now - waiter.enqueued)
+            waiter.future.set_result(None)
+            self._credits[tenant] -= 1
+            if not queue:
+                self._drop(tenant)
+            elif self._credits[tenant] <= 0:
+                self._credits[tenant] = self.weights.get(tenant, 1)
+                self._ring.rotate(-1)
+        # background calls, first come first served, once no interactive call is queued
+        while self._background and self._background_free():
+            waiter = self._background[0]
+            if waiter.future.done():
+                self._background.popleft()
+                continue
+            delay = self._wait_for_budget(waiter.tenant, waiter.tokens, now)
+            if delay > 0:
+                soonest = delay if soonest is None else min(soonest, delay)
+                break
+            self._background.popleft()
+            self._start(waiter.tenant, waiter.tokens, now - waiter.enqueued, low=True)
+            waiter.future.set_result(None)
+        if soonest is not None and self._inflight < self.max_inflight and self._loop is not None:
+            self._timer = self._loop.call_later(soonest, self._dispatch)
+
+    # -- reporting -----------------------------------------------------------
+
+    def stats(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Usage per tenant (or for one tenant): calls, tokens charged and queue wait."""
+        with self._lock:
+            usage = {k: dict(v) for k, v in self._usage.items()}
+        if tenant is not None:
+            usage = {tenant: usage.get(tenant) or _blank_usage()}
+        for k, u in usage.items():
+            queue = self._queues.get(k)
+            u["queued"] = len(queue) if queue else 0
+            u["avg_queue_wait_seconds"] = u["queue_wait_seconds"] / u["calls"] if u["calls"] else 0.0
+        return usage[tenant] if tenant is not None else usage
@@ -0,0 +1,129 @@
+"""Micro-benchmark for backend/db.py under concurrent readers and writers.
+
+Compares the pooled WAL connections in db.py ("after") against opening a
+fresh connection per call in the default rollback-journal mode ("before").
+
+Usage:
+    python backend/scripts/bench_db.py --readers 8 --writers 2 --seconds 5
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+TEXT = "Lorem ipsum dolor sit amet. " * 200
+
+
+class NaiveDB:
+    """Connect-per-call access in rollback-journal mode, as db.py used to do."""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, filename TEXT, upload_path TEXT, "
+            "extracted_path TEXT, text TEXT, uploaded_at TEXT)"
+        )
+        conn.commit()
+        conn.close()
+
+    def create_document(self, doc_id, filename, upload_path, extracted_path, text):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute(
+            "INSERT INTO documents VALUES (?,?,?,?,?,?)",
+            (doc_id, filename, upload_path, extracted_path, text, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+        )
+        conn.commit()
+        conn.close()
+
+    def get_document(self, doc_id):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        row = conn.execute("SELECT * FROM documents WHERE id=?", (doc_id,)).fetchone()
+        conn.close()
+        return row
+
+
+def run(store, readers: int, writers: int, seconds: float, seed_ids):
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def reader(i):
+        n = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                store.get_document(seed_ids[(i + n) % len(seed_ids)])
+                n += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts["reads"] += n
+            counts["errors"] += errors
+
+    def writer(i):
+        n = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                store.create_document(str(uuid.uuid4()), f"w{i}.txt", "/u", "/e", TEXT)
+                n += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts["writes"] += n
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "reads_per_sec": round(counts["reads"] / seconds, 1),
+        "writes_per_sec": round(counts["writes"] / seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--seed-docs", type=int, default=1000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="quizgen-bench-")
+    results = {}
+
+    naive = NaiveDB(os.path.join(tmp, "before.db"))
+    ids = [str(uuid.uuid4()) for _ in range(args.seed_docs)]
+    for doc_id in ids:
+        naive.create_document(doc_id, "seed.txt", "/u", "/e", TEXT)
+    results["before"] = run(naive, args.readers, args.writers, args.seconds, ids)
+
+    os.environ["QUIZGEN_DB_PATH"] = os.path.join(tmp, "after.db")
+    import db
+
+    for doc_id in ids:
+        db.create_document(doc_id, "seed.txt", "/u", "/e", TEXT)
+    results["after"] = run(db, args.readers, args.writers, args.seconds, ids)
+
+    results["config"] = vars(args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark serial vs parallel (page-range) PDF extraction.
+
+Generates a synthetic PDF with scripts/synthetic.py, extracts it once with
+`extract_to_file` and once with `extract_pdf_parallel` over a process pool,
+checks the outputs match, and prints wall-clock times as JSON.
+
+Usage:
+    python backend/scripts/bench_extract.py --pages 400 --workers 4 8 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import extraction
+from scripts.synthetic import make_pdf
+
+
+def _read(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="quizgen-bench-")
+    pdf = os.path.join(tmp, "synthetic.pdf")
+    make_pdf(pdf, args.pages, lines_per_page=args.lines_per_page)
+
+    serial_out = os.path.join(tmp, "serial.txt")
+    start = time.perf_counter()
+    serial_offsets = extraction.extract_to_file(pdf, "synthetic.pdf", serial_out)
+    serial_s = time.perf_counter() - start
+    expected = _read(serial_out)
+
+    results = {"serial_s": round(serial_s, 3), "parallel": []}
+    for workers in args.workers:
+        out = os.path.join(tmp, f"parallel-{workers}.txt")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # spawn the workers (and their imports) before timing
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            offsets = extraction.extract_pdf_parallel(pdf, out, pool, parts=workers)
+            elapsed = time.perf_counter() - start
+        assert offsets == serial_offsets and _read(out) == expected, "parallel output differs from serial"
+        results["parallel"].append({
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "speedup": round(serial_s / elapsed, 2),
+        })
+
+    results["config"] = {**vars(args), "pdf_bytes": os.path.getsize(pdf)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Load test for the upload, generate, search and download paths.
+
+Generates a synthetic corpus (txt, docx and pdf files of configurable size),
+starts the app under uvicorn against a fake LLM server (scripts/fake_llm.py)
+with its own database and storage directory, then drives each endpoint at a
+fixed concurrency:
+
+- upload:   POST /upload for every corpus file
+- generate: POST /generate?fresh=1 for random uploaded documents
+- search:   GET /documents?q=<word>
+- files:    GET /files/{doc_id}
+
+Prints (and optionally writes) throughput and p50/p95/p99 latency per path
+as JSON, tagged with the current git commit so runs can be compared.
+
+Usage:
+    python backend/scripts/bench_load.py --txt 40 --docx 20 --pdf 10 --pdf-pages 30 \\
+        --concurrency 16 --llm-latency 0.2 --llm-failure-rate 0.05 --output bench.json
+
+Pass --base-url to load an already running server instead (it must be
+configured with its own LLM, e.g. OPENAI_API_BASE pointing at fake_llm.py).
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+from scripts.synthetic import WORDS, make_docx, make_pdf, make_txt
+
+
+def build_corpus(directory: str, args) -> list:
+    """Write the synthetic corpus; each file has its own seed, so no two are identical."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(args.txt):
+        path = os.path.join(directory, f"doc{i}.txt")
+        make_txt(path, args.paragraphs, seed=args.seed * 100003 + i)
+        paths.append(path)
+    for i in range(args.docx):
+        path = os.path.join(directory, f"doc{i}.docx")
+        make_docx(path, args.paragraphs, seed=args.seed * 100003 + 50000 + i)
+        paths.append(path)
+    for i in range(args.pdf):
+        path = os.path.join(directory, f"doc{i}.pdf")
+        make_pdf(path, args.pdf_pages, seed=args.seed * 100003 + 90000 + i)
+        paths.append(path)
+    return paths
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: list, errors: int, statuses: dict, elapsed: float) -> dict:
+    ms = sorted(v * 1000 for v in latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+    }
+
+
+async def run_phase(client: httpx.AsyncClient, requests: list, concurrency: int):
+    """Send `requests` (callables returning a request coroutine) with at most `concurrency` in flight.
+
+    A request counts as an error when it raises or gets a non-2xx status.
+    Returns (summary, responses) with the successful responses in input order.
+    """
+    latencies, statuses = [], {}
+    responses = [None] * len(requests)
+    errors = 0
+    queue = list(enumerate(requests))
+    queue.reverse()
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            index, make = queue.pop()
+            start = time.perf_counter()
+            try:
+                response = await make(client)
+            except httpx.HTTPError as e:
+                errors += 1
+                statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+                continue
+            elapsed = time.perf_counter() - start
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.is_success:
+                latencies.append(elapsed)
+                responses[index] = response
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    return summarize(latencies, errors, statuses, time.perf_counter() - start), responses
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited early with code {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def start_servers(args, workdir: str):
+    """Start the fake LLM and the app; return (base_url, processes)."""
+    procs = []
+    log = open(os.path.join(workdir, "servers.log"), "w")
+    python = sys.executable
+
+    llm_port = _free_port()
+    procs.append(subprocess.Popen(
+        [python, os.path.join(TEST_BACKEND_DIR, "scripts", "fake_llm.py"), "--port", str(llm_port),
+         "--latency", str(args.llm_latency), "--failure-rate", str(args.llm_failure_rate), "--seed", str(args.seed)],
+        stdout=log, stderr=log,
+    ))
+    _wait_ready(f"http://127.0.0.1:{llm_port}/stats", procs[-1])
+
+    app_port = _free_port()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="bench",
+        OPENAI_API_BASE=f"http://127.0.0.1:{llm_port}/v1",
+        QUIZGEN_DB_PATH=os.path.join(workdir, "bench.db"),
+        QUIZGEN_STORAGE_DIR=os.path.join(workdir, "storage"),
+        RATE_LIMIT_PER_MIN="0",
+        LLM_BACKOFF=str(args.llm_backoff),
+    )
+    env.pop("API_KEYS", None)
+    procs.append(subprocess.Popen(
+        [python, "-m", "uvicorn", "main:app", "--app-dir", TEST_BACKEND_DIR, "--host", "127.0.0.1",
+         "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning"],
+        stdout=log, stderr=log, env=env,
+    ))
+    base_url = f"http://127.0.0.1:{app_port}"
+    _wait_ready(base_url + "/health", procs[-1])
+    return base_url, procs
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=TEST_BACKEND_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args, base_url: str, corpus: list) -> dict:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        def upload(path):
+            async def send(c):
+                with open(path, "rb") as f:
+                    return await c.post("/upload", files={"file": (os.path.basename(path), f.read())})
+            return send
+
+        results["upload"], responses = await run_phase(client, [upload(p) for p in corpus], args.concurrency)
+        doc_ids = [r.json()["doc_id"] for r in responses if r is not None]
+        if not doc_ids:
+            raise RuntimeError("no uploads succeeded; see servers.log")
+
+        query = "?fresh=1" if not args.allow_cache else ""
+        generate = [
+            (lambda doc_id: lambda c: c.post(f"/generate{query}", json={"doc_id": doc_id, "num_questions": args.questions}))(rng.choice(doc_ids))
+            for _ in range(args.generate_requests)
+        ]
+        results["generate"], _ = await run_phase(client, generate, args.concurrency)
+
+        search = [
+            (lambda word: lambda c: c.get("/documents", params={"q": word, "limit": 20}))(rng.choice(WORDS))
+            for _ in range(args.search_requests)
+        ]
+        results["search"], _ = await run_phase(client, search, args.concurrency)
+
+        files = [
+            (lambda doc_id: lambda c: c.get(f"/files/{doc_id}"))(rng.choice(doc_ids))
+            for _ in range(args.file_requests)
+        ]
+        results["files"], _ = await run_phase(client, files, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--txt", type=int, default=40, help="number of txt files")
+    corpus.add_argument("--docx", type=int, default=20, help="number of docx files")
+    corpus.add_argument("--pdf", type=int, default=10, help="number of pdf files")
+    corpus.add_argument("--paragraphs", type=int, default=50, help="paragraphs per txt/docx file")
+    corpus.add_argument("--pdf-pages", type=int, default=20, help="pages per pdf file")
+    corpus.add_argument("--seed", type=int, default=0)
+    load = parser.add_argument_group("load")
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--generate-requests", type=int, default=100)
+    load.add_argument("--questions", type=int, default=5)
+    load.add_argument("--allow-cache", action="store_true", help="let /generate hit the MCQ cache (default: ?fresh=1)")
+    load.add_argument("--search-requests", type=int, default=500)
+    load.add_argument("--file-requests", type=int, default=200)
+    load.add_argument("--timeout", type=float, default=120.0)
+    server = parser.add_argument_group("server")
+    server.add_argument("--base-url", help="load this running server instead of starting one")
+    server.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started app")
+    server.add_argument("--llm-latency", type=float, default=0.2, help="fake LLM mean seconds per call")
+    server.add_argument("--llm-failure-rate", type=float, default=0.0, help="share of fake LLM calls that fail")
+    server.add_argument("--llm-backoff", type=float, default=0.05, help="LLM_BACKOFF for the started app")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="quizgen-load-")
+    paths = build_corpus(os.path.join(workdir, "corpus"), args)
+    procs = []
+    try:
+        if args.base_url:
+            base_url = args.base_url.rstrip("/")
+        else:
+            base_url, procs = start_servers(args, workdir)
+        results = asyncio.run(run(args, base_url, paths))
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {**vars(args), "corpus_bytes": sum(os.path.getsize(p) for p in paths), "workdir": workdir},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
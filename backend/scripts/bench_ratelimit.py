@@ -0,0 +1,104 @@
+"""Micro-benchmark for the rate limiter under many threads and keys.
+
+Compares ratelimit.TokenBucketLimiter ("after") with the previous
+implementation: one global lock taken separately to refill and to consume
+("before"), and measures the cross-process SQLite backend ("sqlite").
+Prints checks per second and mean latency per check as JSON.
+
+Usage:
+    python backend/scripts/bench_ratelimit.py --threads 16 --keys 10000 --seconds 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+os.environ.setdefault("QUIZGEN_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="quizgen-bench-"), "rl.db"))
+
+from ratelimit import SQLiteLimiter, TokenBucketLimiter
+
+
+class GlobalLockLimiter:
+    """The old main.py buckets: a global lock, taken once to refill and again to consume."""
+
+    def __init__(self, rate_per_min: int):
+        self.rate_per_min = rate_per_min
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _refill(self, key):
+        now = time.time()
+        with self.lock:
+            b = self.buckets.get(key)
+            if not b:
+                self.buckets[key] = {"tokens": float(self.rate_per_min), "last": now}
+                return
+            add = (now - b["last"]) * (self.rate_per_min / 60.0)
+            b["tokens"] = min(float(self.rate_per_min), b["tokens"] + add)
+            b["last"] = now
+
+    def consume(self, key):
+        self._refill(key)
+        with self.lock:
+            b = self.buckets.setdefault(key, {"tokens": float(self.rate_per_min), "last": time.time()})
+            if b["tokens"] >= 1.0:
+                b["tokens"] -= 1.0
+                return True
+            return False
+
+
+def run(limiter, threads: int, keys: int, seconds: float):
+    names = [f"key-{i}" for i in range(keys)]
+    counts = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(offset):
+        n = 0
+        while time.perf_counter() < stop:
+            for _ in range(100):
+                limiter.consume(names[(offset + n) % keys])
+                n += 1
+        with lock:
+            counts.append(n)
+
+    workers = [threading.Thread(target=worker, args=(i * 7919,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    total = sum(counts)
+    return {
+        "checks_per_sec": round(total / seconds, 1),
+        "mean_latency_us": round(seconds * threads / total * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rate", type=int, default=600)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    results = {
+        "before": run(GlobalLockLimiter(args.rate), args.threads, args.keys, args.seconds),
+        "after": run(TokenBucketLimiter(args.rate, shards=args.shards), args.threads, args.keys, args.seconds),
+        "sqlite": run(SQLiteLimiter(args.rate), args.threads, args.keys, args.seconds),
+        "config": vars(args),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Startup-time benchmark: import cost and first-request latency.
+
+For each run, in fresh processes:
+
+- import:  seconds to `import main` (no server)
+- ready:   seconds from spawning uvicorn until GET /health answers
+- first_*: latency of the first pdf upload, docx upload, search and generate
+           after --settle seconds (these pay for any lazily loaded library),
+           then the same requests again ("second_*") for comparison
+
+Runs once without and once with STARTUP_WARMUP=1, and prints medians as JSON.
+
+Usage:
+    python backend/scripts/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+from scripts.bench_load import _free_port
+from scripts.synthetic import make_docx, make_pdf
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def measure_import(env) -> float:
+    out = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=TEST_BACKEND_DIR, env=env, text=True)
+    return float(out.strip().splitlines()[-1])
+
+
+def measure_server(env, files: dict, settle: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", TEST_BACKEND_DIR, "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {}
+    try:
+        with httpx.Client(base_url=base, timeout=60.0) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.005)
+            result["ready"] = time.perf_counter() - start
+            # an instance usually idles a moment before traffic arrives
+            time.sleep(settle)
+
+            def timed(name, send):
+                t = time.perf_counter()
+                response = send()
+                response.raise_for_status()
+                result[name] = time.perf_counter() - t
+                return response
+
+            for attempt in ("first", "second"):
+                # distinct files per attempt, so the second upload is not deduplicated
+                with open(files[attempt, "pdf"], "rb") as f:
+                    doc_id = timed(f"{attempt}_upload_pdf", lambda: client.post("/upload", files={"file": (f"{attempt}.pdf", f.read())})).json()["doc_id"]
+                with open(files[attempt, "docx"], "rb") as f:
+                    timed(f"{attempt}_upload_docx", lambda: client.post("/upload", files={"file": (f"{attempt}.docx", f.read())}))
+                timed(f"{attempt}_search", lambda: client.get("/documents", params={"q": "energy"}))
+                timed(f"{attempt}_generate", lambda: client.post("/generate?fresh=1", json={"doc_id": doc_id, "num_questions": 3}))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds between /health answering and the first request")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="quizgen-startup-")
+    files = {}
+    for seed, attempt in enumerate(("first", "second")):
+        files[attempt, "pdf"] = os.path.join(workdir, f"{attempt}.pdf")
+        files[attempt, "docx"] = os.path.join(workdir, f"{attempt}.docx")
+        make_pdf(files[attempt, "pdf"], args.pdf_pages, seed=seed)
+        make_docx(files[attempt, "docx"], 20, seed=seed)
+
+    report = {"config": vars(args)}
+    for label, warmup in (("cold", "0"), ("warmup", "1")):
+        samples = {}
+        for run in range(args.runs):
+            env = dict(
+                os.environ,
+                QUIZGEN_DB_PATH=os.path.join(workdir, f"{label}{run}", "startup.db"),
+                QUIZGEN_STORAGE_DIR=os.path.join(workdir, f"{label}{run}", "storage"),
+                STARTUP_WARMUP=warmup,
+                RATE_LIMIT_PER_MIN="0",
+            )
+            # no LLM: /generate measures the app's own path (dummy fallback)
+            env.pop("OPENAI_API_KEY", None)
+            samples.setdefault("import", []).append(measure_import(env))
+            for key, value in measure_server(env, files, args.settle).items():
+                samples.setdefault(key, []).append(value)
+        report[label] = {k: round(statistics.median(v) * 1000, 1) for k, v in samples.items()}
+    report["units"] = "ms (median)"
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Fake OpenAI-compatible chat completion server for benchmarks.
+
+Answers POST /v1/chat/completions with a JSON array of MCQs (as many as the
+prompt's "Generate N MCQs." asks for), after a configurable latency. A
+configurable share of calls fails, either with a 500 or with a reply that is
+not valid JSON, so the retry and recovery paths get exercised too. Supports
+`stream: true` (server-sent events, a few characters per chunk).
+
+Point the app at it with OPENAI_API_BASE=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python backend/scripts/fake_llm.py --port 8900 --latency 0.2 --failure-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def make_app(latency: float = 0.2, jitter: float = 0.5, failure_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    stats = {"calls": 0, "failures": 0}
+
+    def _mcqs(prompt: str):
+        match = re.search(r"Generate (\d+) MCQs", prompt)
+        n = int(match.group(1)) if match else 5
+        words = re.findall(r"[A-Za-z]{5,}", prompt)[:200] or ["topic"]
+        return [
+            {
+                "question": f"Which statement about {rng.choice(words).lower()} is correct? ({i + 1})",
+                "options": [f"Option {c}" for c in "ABCD"],
+                "answer_index": rng.randrange(4),
+            }
+            for i in range(n)
+        ]
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["calls"] += 1
+        await asyncio.sleep(max(0.0, latency * (1 + jitter * (2 * rng.random() - 1))))
+        if rng.random() < failure_rate:
+            stats["failures"] += 1
+            if rng.random() < 0.5:
+                return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+            content = "Sorry, here are your questions: not JSON"
+        else:
+            prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+            content = json.dumps(_mcqs(prompt))
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            })
+
+        async def _events():
+            for i in range(0, len(content), 16):
+                chunk = {"choices": [{"index": 0, "delta": {"content": content[i:i + 16]}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(_events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency varies by +/- this fraction")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = make_app(args.latency, args.jitter, args.failure_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Synthetic documents for benchmarks and tests.
+
+`make_pdf` writes a plain multi-page text PDF without any third-party PDF
+writer, so benchmarks can generate large inputs on any machine.
+"""
+
+import random
+from typing import List, Optional
+
+WORDS = (
+    "cell energy protein membrane theory history empire trade river climate "
+    "equation vector matrix function variable market policy culture language "
+    "signal network system process model result method analysis evidence"
+).split()
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def paragraphs(count: int, seed: int = 0, sentences: int = 5) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(sentence(rng) for _ in range(sentences)) for _ in range(count)]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 40, seed: int = 0, page_lines: Optional[List[List[str]]] = None) -> None:
+    """Write a `pages`-page PDF of random sentences (or the given `page_lines`)."""
+    rng = random.Random(seed)
+    if page_lines is None:
+        page_lines = [
+            [f"Page {p + 1}. " + sentence(rng, 8) for _ in range(lines_per_page)]
+            for p in range(pages)
+        ]
+    n = len(page_lines)
+    # object numbers: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for i, lines in enumerate(page_lines):
+        page_no, content_no = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_no} 0 R")
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        objects[page_no] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_no} 0 R >>"
+        ).encode()
+        objects[content_no] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {n} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += b"%d 0 obj\n" % num + objects[num] + b"\nendobj\n"
+    xref = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for num in range(1, size):
+        out += b"%010d 00000 n \n" % offsets[num]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_docx(path: str, paragraph_count: int, seed: int = 0) -> None:
+    import docx
+
+    document = docx.Document()
+    for para in paragraphs(paragraph_count, seed=seed):
+        document.add_paragraph(para)
+    document.save(path)
+
+
+def make_txt(path: str, paragraph_count: int, seed: int = 0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs(paragraph_count, seed=seed)))
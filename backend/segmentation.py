@@ -0,0 +1,143 @@
+"""Page, paragraph and sentence boundaries for stored documents.
+
+Segments are computed once per document body (at upload, or by the
+background backfill for older documents) and stored as character spans
+with estimated token counts in the `segments` table (see db.py).
+Generation then reads spans instead of re-splitting the whole text.
+
+Work is done a batch of pages at a time, and each batch is committed
+together with the page it stopped at, so an interrupted run resumes where
+it left off. Rows are keyed by (body, kind, start offset), so redoing a
+batch writes the same rows again.
+"""
+
+import os
+import re
+import logging
+from typing import List, Optional, Sequence, Set, Tuple
+
+try:
+    from . import db
+    from .chunking import estimate_tokens
+except Exception:
+    import db
+    from chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump when the splitting rules change; bodies segmented by an older version are redone
+SEGMENT_VERSION = 1
+# Pages segmented per transaction
+SEGMENT_BATCH_PAGES = int(os.getenv("SEGMENT_BATCH_PAGES", "50"))
+
+# (kind, start, end, tokens, page)
+Segment = Tuple[str, int, int, int, int]
+
+_BLANK_LINE = re.compile(r"\n[ \t]*\n\s*")
+_NEWLINE = re.compile(r"\n")
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+|\Z)")
+
+
+def _trim(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _split(text: str, start: int, end: int, separator: "re.Pattern") -> List[Tuple[int, int]]:
+    spans = []
+    pos = start
+    for m in separator.finditer(text, start, end):
+        span = _trim(text, pos, m.start())
+        if span:
+            spans.append(span)
+        pos = m.end()
+    span = _trim(text, pos, end)
+    if span:
+        spans.append(span)
+    return spans
+
+
+def paragraph_spans(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """Paragraphs in text[start:end]: blank-line separated, else one per line (as in chunking)."""
+    spans = _split(text, start, end, _BLANK_LINE)
+    if len(spans) == 1:
+        spans = _split(text, start, end, _NEWLINE)
+    return spans
+
+
+def sentence_spans(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    spans = []
+    for m in _SENTENCE.finditer(text, start, end):
+        span = _trim(text, m.start(), m.end())
+        if span:
+            spans.append(span)
+    return spans
+
+
+def page_bounds(text: str, page_offsets: Optional[Sequence[int]]) -> List[Tuple[int, int]]:
+    """(start, end) of each page; pages are newline-joined, text without offsets is one page."""
+    if not page_offsets:
+        return [(0, len(text))]
+    bounds = list(page_offsets) + [len(text) + 1]
+    return [(bounds[i], max(bounds[i], bounds[i + 1] - 1)) for i in range(len(page_offsets))]
+
+
+def segment_page(text: str, start: int, end: int, page: int) -> List[Segment]:
+    rows: List[Segment] = [("page", start, end, estimate_tokens(text[start:end]), page)]
+    for p_start, p_end in paragraph_spans(text, start, end):
+        rows.append(("paragraph", p_start, p_end, estimate_tokens(text[p_start:p_end]), page))
+        for s_start, s_end in sentence_spans(text, p_start, p_end):
+            rows.append(("sentence", s_start, s_end, estimate_tokens(text[s_start:s_end]), page))
+    return rows
+
+
+def segment_body(body_id: str, text: Optional[str] = None, page_offsets: Optional[Sequence[int]] = None,
+                 batch_pages: int = SEGMENT_BATCH_PAGES) -> bool:
+    """Bring the segments of one document body up to date.
+
+    Pass `text`/`page_offsets` when they are at hand (e.g. right after
+    upload); otherwise they are read from the database. Returns False if
+    there was nothing to do.
+    """
+    progress = db.get_segment_progress(body_id)
+    if progress and progress["version"] == SEGMENT_VERSION and progress["complete"]:
+        return False
+    if text is None:
+        body = db.get_body(body_id)
+        if body is None:
+            return False
+        text, page_offsets = body
+    pages = page_bounds(text, page_offsets)
+    restart = not progress or progress["version"] != SEGMENT_VERSION
+    next_page = 0 if restart else progress["next_page"]
+    while True:
+        stop = min(next_page + max(batch_pages, 1), len(pages))
+        rows: List[Segment] = []
+        for page in range(next_page, stop):
+            rows.extend(segment_page(text, pages[page][0], pages[page][1], page))
+        db.store_segments(body_id, rows, SEGMENT_VERSION, stop, complete=stop >= len(pages), restart=restart)
+        restart = False
+        next_page = stop
+        if next_page >= len(pages):
+            return True
+
+
+def backfill(limit: int = 10, failed: Optional[Set[str]] = None) -> int:
+    """Segment up to `limit` bodies that are missing, partial or outdated. Returns how many were tried.
+
+    A body that fails is logged and added to `failed`; bodies already in
+    `failed` are not tried again, so repeated calls run out of work even
+    when some bodies cannot be segmented.
+    """
+    failed = set() if failed is None else failed
+    body_ids = db.bodies_needing_segments(SEGMENT_VERSION, limit, exclude=failed)
+    for body_id in body_ids:
+        try:
+            segment_body(body_id)
+        except Exception:
+            logger.exception("segmenting body %s failed; skipping it", body_id)
+            failed.add(body_id)
+    return len(body_ids)
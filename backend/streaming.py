@@ -0,0 +1,72 @@
+"""Helpers for streaming MCQs to clients as server-sent events.
+
+`MCQStreamParser` pulls complete objects out of a JSON array while the LLM
+is still emitting it, so each question can be validated and sent on its own.
+"""
+
+import json
+from typing import Any, List
+
+
+class MCQStreamParser:
+    """Incrementally extract the top-level objects of a streamed JSON array.
+
+    Text before the opening `[` (e.g. a stray preamble) is skipped. Scanning
+    is linear: each character is looked at once, tracking string/escape state
+    and brace depth to find where an object ends.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._obj_start = -1
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, piece: str) -> List[Any]:
+        """Add more model output; return objects completed by it (parsed JSON)."""
+        self._buf += piece
+        out: List[Any] = []
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        out.append(json.loads(buf[self._obj_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._obj_start = -1
+            i += 1
+        # drop consumed text so the buffer only holds the current object
+        keep_from = self._obj_start if self._obj_start >= 0 else i
+        self._buf = buf[keep_from:]
+        if self._obj_start >= 0:
+            self._obj_start = 0
+        self._pos = i - keep_from
+        return out
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
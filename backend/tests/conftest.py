@@ -0,0 +1,46 @@
+import atexit
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+# Set before any test module imports the app: nothing a test does may reach
+# the real backend/storage database or upload directories
+_SESSION_DIR = tempfile.mkdtemp(prefix="quizgen-tests-")
+atexit.register(shutil.rmtree, _SESSION_DIR, ignore_errors=True)
+os.environ["QUIZGEN_DB_PATH"] = os.path.join(_SESSION_DIR, "quizgen.db")
+os.environ["QUIZGEN_STORAGE_DIR"] = os.path.join(_SESSION_DIR, "storage")
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Point `db` at an empty database under `tmp_path` and return its path."""
+    import cache
+    import db
+
+    path = tmp_path / "quizgen.db"
+    monkeypatch.setenv("QUIZGEN_DB_PATH", str(path))
+    importlib.reload(db)
+    cache.clear_memory()
+    return path
+
+
+@pytest.fixture
+def app_storage(fresh_db, tmp_path, monkeypatch):
+    """Give the app an empty database and storage directory under `tmp_path`."""
+    import main
+
+    storage = tmp_path / "storage"
+    monkeypatch.setenv("QUIZGEN_STORAGE_DIR", str(storage))
+    monkeypatch.setattr(main, "STORAGE_DIR", str(storage))
+    monkeypatch.setattr(main, "UPLOAD_DIR", str(storage / "uploads"))
+    monkeypatch.setattr(main, "EXTRACTED_DIR", str(storage / "extracted"))
+    monkeypatch.setattr(main, "_storage_ready", False)
+    return storage
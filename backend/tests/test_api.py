@@ -10,9 +10,27 @@ TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
 if TEST_BACKEND_DIR not in sys.path:
     sys.path.insert(0, TEST_BACKEND_DIR)
 
-from main import app, UPLOAD_DIR, EXTRACTED_DIR
+from main import app
 import db
 
+# every test gets its own database and upload directory (see conftest.py)
+pytestmark = pytest.mark.usefixtures("app_storage")
+
+
+class _Resp:
+    """A chat completion response carrying `content`, as returned by openai.ChatCompletion.acreate."""
+
+    def __init__(self, content):
+        msg = type("M", (), {"content": content})
+        self.choices = [type("C", (), {"message": msg})]
+
+
+class _Chunk:
+    """One piece of a streamed chat completion."""
+
+    def __init__(self, piece):
+        self.choices = [type("C", (), {"delta": {"content": piece}})]
+
 
 def test_health():
     async def _run():
@@ -56,3 +74,635 @@ def test_upload_and_generate_txt(tmp_path):
 
     import asyncio
     asyncio.run(_run())
+
+
+def test_upload_reports_stage_timings():
+    content = b"Timing test document. Another sentence."
+    files = {"file": ("timed.txt", io.BytesIO(content), "text/plain")}
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            up = await ac.post("/upload", files=files)
+            assert up.status_code == 200
+            timing = up.headers.get("server-timing", "")
+            for stage in ("save", "extract", "persist"):
+                assert f"{stage};dur=" in timing
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_upload_rejected_when_extraction_pool_saturated(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "_extract_inflight", main._extract_capacity())
+    files = {"file": ("busy.txt", io.BytesIO(b"Busy document."), "text/plain")}
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            up = await ac.post("/upload", files=files)
+            assert up.status_code == 503
+            assert up.headers.get("retry-after") == "1"
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_only_extraction_counts_against_the_pool(monkeypatch):
+    import main
+
+    seen = {}
+    find_document_by_hash = db.find_document_by_hash
+    run_extraction = main.run_extraction
+
+    def find(content_hash):
+        # the body has been saved and hashed by now
+        seen.setdefault("saving", []).append(main._extract_inflight)
+        return find_document_by_hash(content_hash)
+
+    async def extract(*args, **kwargs):
+        seen.setdefault("extracting", []).append(main._extract_inflight)
+        return await run_extraction(*args, **kwargs)
+
+    monkeypatch.setattr(db, "find_document_by_hash", find)
+    monkeypatch.setattr(main, "run_extraction", extract)
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            for name in ("one.txt", "copy.txt"):
+                up = await ac.post("/upload", files={"file": (name, io.BytesIO(b"Counted document."), "text/plain")})
+                assert up.status_code == 200
+
+    import asyncio
+    asyncio.run(_run())
+    # the copy is deduplicated and never takes a slot
+    assert seen == {"saving": [0, 0], "extracting": [1]}
+    assert main._extract_inflight == 0
+
+
+def test_generate_async_job():
+    files = {"file": ("job.txt", io.BytesIO(b"Jobs run in the background. Results are polled."), "text/plain")}
+
+    async def _run():
+        import asyncio
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            up = await ac.post("/upload", files=files)
+            doc_id = up.json()["doc_id"]
+
+            gen = await ac.post("/generate?async=1", json={"doc_id": doc_id, "num_questions": 2})
+            assert gen.status_code == 202
+            job_id = gen.json()["job_id"]
+
+            body = None
+            for _ in range(100):
+                r = await ac.get(f"/jobs/{job_id}")
+                assert r.status_code == 200
+                body = r.json()
+                if body["status"] in ("done", "failed"):
+                    break
+                await asyncio.sleep(0.05)
+            assert body["status"] == "done"
+            assert body["doc_id"] == doc_id
+            assert len(body["mcqs"]) == 2
+
+            missing = await ac.get("/jobs/does-not-exist")
+            assert missing.status_code == 404
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_generate_served_from_cache(monkeypatch):
+    import json
+    import openai
+
+    valid = [{"question": "Cached?", "options": ["A", "B", "C", "D"], "answer_index": 0}]
+    calls = {"n": 0}
+
+    async def fake_acreate(*args, **kwargs):
+        calls["n"] += 1
+        return _Resp(json.dumps(valid))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    files = {"file": ("cached.txt", io.BytesIO(b"Cache me."), "text/plain")}
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_id = (await ac.post("/upload", files=files)).json()["doc_id"]
+            first = await ac.post("/generate", json={"doc_id": doc_id, "num_questions": 1})
+            second = await ac.post("/generate", json={"doc_id": doc_id, "num_questions": 1})
+            assert first.json()["cached"] is False
+            assert second.json()["cached"] is True
+            assert second.json()["mcqs"] == valid
+            assert calls["n"] == 1
+
+            fresh = await ac.post("/generate?fresh=1", json={"doc_id": doc_id, "num_questions": 1})
+            assert fresh.json()["cached"] is False
+            assert calls["n"] == 2
+
+            stats = (await ac.get("/cache/stats")).json()
+            assert stats["hits"] >= 1 and stats["misses"] >= 1
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_llm_usage_is_charged_per_api_key(monkeypatch):
+    import json
+    import main
+    import openai
+
+    valid = [{"question": "Budget?", "options": ["A", "B", "C", "D"], "answer_index": 0}]
+
+    async def fake_acreate(*args, **kwargs):
+        return _Resp(json.dumps(valid))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "_llm_scheduler", main.scheduler.LLMScheduler(2))
+    text = "words to charge for. " * 50
+    files = {"file": ("usage.txt", io.BytesIO(text.encode()), "text/plain")}
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_id = (await ac.post("/upload", files=files)).json()["doc_id"]
+            gen = await ac.post("/generate?fresh=1", json={"doc_id": doc_id, "num_questions": 1}, headers={"X-API-Key": "tenant-a"})
+            assert gen.status_code == 200
+            usage = (await ac.get("/usage", headers={"X-API-Key": "tenant-a"})).json()
+            assert usage["calls"] == 1
+            # at least the document itself, at ~4 characters per token
+            assert usage["tokens_charged"] >= len(text) // 4
+            other = (await ac.get("/usage", headers={"X-API-Key": "tenant-b"})).json()
+            assert other["calls"] == 0 and other["tokens_charged"] == 0
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_upload_dedupes_identical_bytes(monkeypatch):
+    import main
+
+    content = b"Shared syllabus. Week one."
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            first = await ac.post("/upload", files={"file": ("a.txt", io.BytesIO(content), "text/plain")})
+            assert first.json()["deduplicated"] is False
+
+            async def no_extraction(*args, **kwargs):
+                raise AssertionError("duplicate upload must not be re-extracted")
+
+            run_extraction = main.run_extraction
+            monkeypatch.setattr(main, "run_extraction", no_extraction)
+            second = await ac.post("/upload", files={"file": ("b.txt", io.BytesIO(content), "text/plain")})
+            assert second.status_code == 200
+            assert second.json()["deduplicated"] is True
+
+            a = db.get_document(first.json()["doc_id"])
+            b = db.get_document(second.json()["doc_id"])
+            assert b["filename"] == "b.txt"
+            assert b["upload_path"] == a["upload_path"]
+            assert db.get_document_text(b["id"]) == db.get_document_text(a["id"])
+            assert b["content_hash"] == a["content_hash"]
+
+            # the same bytes under another file type go through extraction again
+            monkeypatch.setattr(main, "run_extraction", run_extraction)
+            other = await ac.post("/upload", files={"file": ("a.md", io.BytesIO(content), "text/plain")})
+            assert other.json()["deduplicated"] is False
+            assert db.get_document(other.json()["doc_id"])["content_hash"] != a["content_hash"]
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_upload_over_size_limit_rejected(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 256)
+    main._ensure_storage()
+    before = set(os.listdir(main.UPLOAD_DIR))
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            # caught while streaming to disk (Content-Length is within the multipart allowance)
+            up = await ac.post("/upload", files={"file": ("big.txt", io.BytesIO(b"x" * 5000), "text/plain")})
+            assert up.status_code == 413
+            # rejected from Content-Length before the body is parsed
+            huge = b"x" * (main._MULTIPART_OVERHEAD + 2000)
+            up = await ac.post("/upload", files={"file": ("huge.txt", io.BytesIO(huge), "text/plain")})
+            assert up.status_code == 413
+
+    import asyncio
+    asyncio.run(_run())
+    # nothing (not even a partial file) was left behind
+    assert set(os.listdir(main.UPLOAD_DIR)) == before
+
+
+def test_upload_without_content_length_stops_at_limit(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr(main, "_MULTIPART_OVERHEAD", 1000)
+    boundary = "quizgenlimit"
+    sent = []
+
+    async def body():
+        yield (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="big.txt"\r\n'
+            "Content-Type: text/plain\r\n\r\n"
+        ).encode()
+        for _ in range(100):
+            sent.append(1024)
+            yield b"x" * 1024
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            up = await ac.post(
+                "/upload",
+                content=body(),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            )
+            assert up.status_code == 413
+
+    import asyncio
+    asyncio.run(_run())
+    # the body was cut off near the limit rather than spooled in full
+    assert sum(sent) <= 3 * 1024
+
+
+def test_documents_next_cursor():
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            for i in range(3):
+                files = {"file": (f"page{i}.txt", io.BytesIO(f"Page {i}.".encode()), "text/plain")}
+                assert (await ac.post("/upload", files=files)).status_code == 200
+
+            first = (await ac.get("/documents?limit=2")).json()
+            assert len(first["documents"]) == 2
+            assert first["next_cursor"]
+            second = (await ac.get("/documents", params={"limit": 2, "cursor": first["next_cursor"]})).json()
+            first_ids = {d["id"] for d in first["documents"]}
+            assert second["documents"]
+            assert not first_ids & {d["id"] for d in second["documents"]}
+
+            bad = await ac.get("/documents?cursor=garbage")
+            assert bad.status_code == 400
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_generate_batch_streams_ndjson():
+    import json
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_ids = []
+            for i in range(3):
+                body = f"Batch doc {i}. Another sentence here.".encode()
+                up = await ac.post("/upload", files={"file": (f"batch{i}.txt", io.BytesIO(body), "text/plain")})
+                doc_ids.append(up.json()["doc_id"])
+
+            items = [{"doc_id": d, "num_questions": 2} for d in doc_ids] + [{"doc_id": "missing", "num_questions": 1}]
+            r = await ac.post("/generate/batch", json=items)
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in r.text.splitlines() if line]
+            assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+            by_index = {line["index"]: line for line in lines}
+            for i, d in enumerate(doc_ids):
+                assert by_index[i]["doc_id"] == d
+                assert len(by_index[i]["mcqs"]) == 2
+            assert by_index[3]["error"] == "doc_id not found"
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_generate_stream_sends_each_mcq(monkeypatch):
+    import json
+    import openai
+
+    items = [
+        {"question": "S1", "options": ["A", "B", "C", "D"], "answer_index": 0},
+        {"question": "Broken", "options": ["A", "B"], "answer_index": 0},
+        {"question": "S2", "options": ["A", "B", "C", "D"], "answer_index": 1},
+    ]
+    payload = json.dumps(items)
+
+    async def _pieces():
+        for i in range(0, len(payload), 7):
+            yield _Chunk(payload[i:i + 7])
+
+    async def fake_acreate(*args, **kwargs):
+        assert kwargs.get("stream") is True
+        return _pieces()
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    body = b"Streaming doc. More text."
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_id = (await ac.post("/upload", files={"file": ("s.txt", io.BytesIO(body), "text/plain")})).json()["doc_id"]
+            r = await ac.post("/generate/stream", json={"doc_id": doc_id, "num_questions": 3})
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("text/event-stream")
+            events = []
+            for block in r.text.strip().split("\n\n"):
+                lines = dict(line.split(": ", 1) for line in block.splitlines())
+                events.append((lines["event"], json.loads(lines["data"])))
+            mcqs = [data for name, data in events if name == "mcq"]
+            assert [m["question"] for m in mcqs[:2]] == ["S1", "S2"]
+            assert [m["index"] for m in mcqs] == [0, 1, 2]
+            name, done = events[-1]
+            assert name == "done"
+            assert done == {"cached": False, "fallback": False, "padded": 1, "invalid": 1, "count": 3}
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_generate_stream_reports_failures(monkeypatch, caplog):
+    import json
+    import openai
+
+    async def _pieces():
+        yield _Chunk(json.dumps([{"question": "S1", "options": ["A", "B", "C", "D"], "answer_index": 0}])[:-1] + ",")
+        raise RuntimeError("connection reset")
+
+    async def fake_acreate(*args, **kwargs):
+        return _pieces()
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            files = {"file": ("f.txt", io.BytesIO(b"Failing stream doc."), "text/plain")}
+            doc_id = (await ac.post("/upload", files=files)).json()["doc_id"]
+            r = await ac.post("/generate/stream", json={"doc_id": doc_id, "num_questions": 3})
+            events = []
+            for block in r.text.strip().split("\n\n"):
+                lines = dict(line.split(": ", 1) for line in block.splitlines())
+                events.append((lines["event"], json.loads(lines["data"])))
+            assert [name for name, _ in events] == ["mcq", "error"]
+            assert events[-1][1] == {"detail": "Generation failed", "count": 1}
+
+    import asyncio
+    asyncio.run(_run())
+    assert "streamed generation for document" in caplog.text
+
+
+def test_padding_does_not_repeat_questions():
+    import asyncio
+    import main
+
+    text = "Cells divide. Plants grow."
+    validated = main.generate_dummy_mcqs(text, 1)
+    info = {}
+    padded = asyncio.run(main._pad_with_dummies(text, validated, 4, info))
+    questions = [m["question"] for m in padded]
+    assert info["padded"] == 3
+    # the first sentence is already asked about, and the generic filler is numbered
+    assert questions[1] == "What is the main idea of: Plants grow?"
+    assert len(set(questions)) == 4
+
+
+def test_metrics_endpoint_reports_hot_paths():
+    files = {"file": ("metrics.txt", io.BytesIO(b"Measured text."), "text/plain")}
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_id = (await ac.post("/upload", files=files)).json()["doc_id"]
+            assert (await ac.get(f"/files/{doc_id}")).status_code == 200
+            r = await ac.get("/metrics")
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("text/plain")
+            return r.text
+
+    import asyncio
+    text = asyncio.run(_run())
+    pid = f'pid="{os.getpid()}"'
+    assert f'quizgen_extraction_seconds_count{{type="txt",{pid}}}' in text
+    assert f"quizgen_upload_save_seconds_count{{{pid}}} " in text
+    assert f'quizgen_db_call_seconds_count{{op="create_document",{pid}}}' in text
+    assert f'quizgen_request_seconds_count{{method="GET",route="/files/{{doc_id}}",status="200",{pid}}}' in text
+    assert "# TYPE quizgen_rate_limit_rejections_total counter" in text
+
+
+def test_quiz_samples_the_question_bank(monkeypatch):
+    import json
+    import re
+    import main
+    import openai
+
+    calls = []
+    topics = iter(["rivers", "mountains", "deserts", "forests", "oceans", "glaciers", "islands", "canyons"])
+
+    async def fake_acreate(*args, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        calls.append(prompt)
+        n = int(re.search(r"Generate (\d+) MCQs", prompt).group(1))
+        return _Resp(json.dumps([
+            {"question": f"What shapes the {next(topics)}?", "options": ["A", "B", "C", "D"], "answer_index": 0}
+            for _ in range(n)
+        ]))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "_llm_scheduler", main.scheduler.LLMScheduler(2))
+    body = b"Geography notes. Landforms change slowly."
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_id = (await ac.post("/upload", files={"file": ("geo.txt", io.BytesIO(body), "text/plain")})).json()["doc_id"]
+            # generated questions are banked
+            await ac.post("/generate", json={"doc_id": doc_id, "num_questions": 4})
+            assert len(db.get_questions(doc_id)) == 4 and len(calls) == 1
+
+            first = (await ac.get(f"/documents/{doc_id}/quiz", params={"n": 2, "seed": 7})).json()
+            again = (await ac.get(f"/documents/{doc_id}/quiz", params={"n": 2, "seed": 7})).json()
+            assert first["seed"] == 7 and first["generated"] == again["generated"] == 0
+            # the same seed replays the quiz, and quizzes never run the bank dry
+            assert again["mcqs"] == first["mcqs"]
+            assert all(set(m) == {"question", "options", "answer_index"} for m in first["mcqs"])
+            for seed in range(20):
+                quiz = (await ac.get(f"/documents/{doc_id}/quiz", params={"n": 4, "seed": seed})).json()
+                assert quiz["generated"] == 0 and len(quiz["mcqs"]) == 4
+            assert len(calls) == 1
+            unseeded = (await ac.get(f"/documents/{doc_id}/quiz", params={"n": 3})).json()
+            assert isinstance(unseeded["seed"], int)
+
+            # bank too small: top up, listing the banked questions so they are not repeated
+            big = (await ac.get(f"/documents/{doc_id}/quiz", params={"n": 6})).json()
+            assert big["generated"] == 2 and len(calls) == 2
+            assert "Generate 2 MCQs." in calls[1] and "- What shapes the rivers?" in calls[1]
+            assert {m["question"] for m in big["mcqs"]} == {q["question"] for q in db.get_questions(doc_id)}
+            assert (await ac.get("/documents/missing/quiz")).status_code == 404
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_upload_pregenerates_questions_and_delete_cancels(monkeypatch):
+    import json
+    import re
+    import main
+    import openai
+    import pregen
+
+    calls = []
+    release = None
+
+    async def fake_acreate(*args, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        calls.append(prompt)
+        if "BLOCK" in prompt:
+            await release.wait()
+        n = int(re.search(r"Generate (\d+) MCQs", prompt).group(1))
+        return _Resp(json.dumps([
+            {"question": f"Prepared question {len(calls)}.{i} about the notes?", "options": ["A", "B", "C", "D"], "answer_index": 0}
+            for i in range(n)
+        ]))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "_llm_scheduler", main.scheduler.LLMScheduler(2))
+    monkeypatch.setattr(main, "_pregen", pregen.Pregenerator(main._pregenerate, enabled=True, questions=3, tenants={"quiet": 0}))
+
+    def _file(name, marker=""):
+        body = f"{marker} Notes for {name}. Prepared in the background.".encode()
+        return {"file": (name, io.BytesIO(body), "text/plain")}
+
+    async def _run():
+        nonlocal release
+        release = asyncio.Event()
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_id = (await ac.post("/upload", files=_file("pre.txt"))).json()["doc_id"]
+            for _ in range(100):
+                if calls:
+                    break
+                await asyncio.sleep(0.01)
+            # the request waits for the pre-generation already calling the LLM and is served from its results
+            gen = (await ac.post("/generate", json={"doc_id": doc_id, "num_questions": 3})).json()
+            assert gen["cached"] and len(calls) == 1
+            assert [m["question"] for m in gen["mcqs"]] == [f"Prepared question 1.{i} about the notes?" for i in range(3)]
+
+            # per-tenant setting: nothing is prepared for this key
+            (await ac.post("/upload", files=_file("quiet.txt"), headers={"X-API-Key": "quiet"})).json()
+            await asyncio.sleep(0.05)
+            assert len(calls) == 1
+
+            # deleting the document cancels its pre-generation and removes what it left behind
+            blocked = (await ac.post("/upload", files=_file("blocked.txt", "BLOCK"))).json()["doc_id"]
+            for _ in range(100):
+                if main._pregen.running(blocked) and len(calls) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            deleted = (await ac.delete(f"/documents/{blocked}")).json()
+            assert deleted == {"doc_id": blocked, "deleted": True, "pregen_cancelled": True}
+            release.set()
+            await asyncio.sleep(0.05)
+            assert db.get_questions(blocked) == [] and db.get_document(blocked) is None
+            assert (await ac.get(f"/documents/{blocked}/quiz")).status_code == 404
+            assert (await ac.delete(f"/documents/{blocked}")).status_code == 404
+            assert not [d for d in (await ac.get("/documents", params={"q": "BLOCK"})).json()["documents"] if d["id"] == blocked]
+
+    import asyncio
+    asyncio.run(_run())
+
+
+def test_identical_uploads_are_pregenerated_once(monkeypatch):
+    import json
+    import re
+    import main
+    import openai
+    import pregen
+
+    calls = []
+
+    async def fake_acreate(*args, **kwargs):
+        calls.append(kwargs["messages"][-1]["content"])
+        # still generating while the copies arrive
+        await uploaded.wait()
+        n = int(re.search(r"Generate (\d+) MCQs", calls[-1]).group(1))
+        return _Resp(json.dumps([
+            {"question": f"Shared question {i}?", "options": ["A", "B", "C", "D"], "answer_index": 0} for i in range(n)
+        ]))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "_llm_scheduler", main.scheduler.LLMScheduler(2))
+    monkeypatch.setattr(main, "_pregen", pregen.Pregenerator(main._pregenerate, enabled=True, questions=3, concurrency=2, tenants={}))
+    content = b"The same notes, uploaded three times. Second sentence."
+
+    uploaded = None
+
+    async def _run():
+        nonlocal uploaded
+        uploaded = asyncio.Event()
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            doc_ids = []
+            for name in ("a.txt", "b.txt", "c.txt"):
+                up = (await ac.post("/upload", files={"file": (name, io.BytesIO(content), "text/plain")})).json()
+                doc_ids.append(up["doc_id"])
+                await asyncio.sleep(0.01)
+            uploaded.set()
+            for _ in range(100):
+                if not main._pregen.pending():
+                    break
+                await asyncio.sleep(0.01)
+            return doc_ids
+
+    import asyncio
+    doc_ids = asyncio.run(_run())
+    # copies wait for the first one and take over its questions
+    assert len(calls) == 1
+    for doc_id in doc_ids:
+        assert [q["question"] for q in db.get_questions(doc_id)] == [f"Shared question {i}?" for i in range(3)]
+
+
+def test_delete_keeps_content_shared_with_deduplicated_upload():
+    content = b"Shared for deletion. Second sentence."
+
+    async def _run():
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            first = (await ac.post("/upload", files={"file": ("a.txt", io.BytesIO(content), "text/plain")})).json()
+            second = (await ac.post("/upload", files={"file": ("b.txt", io.BytesIO(content), "text/plain")})).json()
+            assert second["deduplicated"]
+            path = db.get_document(first["doc_id"])["upload_path"]
+
+            assert (await ac.delete(f"/documents/{first['doc_id']}")).status_code == 200
+            assert os.path.exists(path)
+            assert db.get_document_text(second["doc_id"]) == content.decode()
+            assert (await ac.get(f"/files/{second['doc_id']}")).status_code == 200
+
+            assert (await ac.delete(f"/documents/{second['doc_id']}")).status_code == 200
+            assert not os.path.exists(path)
+
+    import asyncio
+    asyncio.run(_run())
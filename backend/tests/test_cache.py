@@ -0,0 +1,46 @@
+import os
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import db
+import cache
+
+
+MCQS = [{"question": "Q", "options": ["A", "B", "C", "D"], "answer_index": 0}]
+
+
+def test_key_depends_on_text_model_count_and_prompt():
+    base = cache.make_key("text", "m", 5, "1")
+    assert base == cache.make_key("text", "m", 5, "1")
+    assert base != cache.make_key("other text", "m", 5, "1")
+    assert base != cache.make_key("text", "m2", 5, "1")
+    assert base != cache.make_key("text", "m", 6, "1")
+    assert base != cache.make_key("text", "m", 5, "2")
+
+
+def test_put_get_survives_memory_clear(fresh_db):
+    key = cache.make_key("doc", "m", 1, "1")
+    assert cache.get(key) is None
+    cache.put(key, MCQS)
+    assert cache.get(key) == MCQS
+    # served from SQLite once the in-process LRU is gone
+    cache.clear_memory()
+    assert cache.get(key) == MCQS
+    stats = cache.stats()
+    assert stats["hits"] >= 2 and stats["misses"] >= 1
+
+
+def test_evicts_by_size_and_age(fresh_db):
+    size = db.cache_put("a", MCQS)
+    db.cache_put("b", MCQS)
+    db.cache_get("b")
+    # only room for one entry: the least recently used one goes
+    db.cache_evict(max_bytes=size, max_age_seconds=3600)
+    assert db.cache_get("a") is None
+    assert db.cache_get("b") is not None
+    # everything is older than a negative age limit
+    db.cache_evict(max_bytes=10 ** 9, max_age_seconds=-1)
+    assert db.cache_get("b") is None
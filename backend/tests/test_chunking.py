@@ -0,0 +1,47 @@
+import os
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import chunking
+
+
+def _q(text):
+    return {"question": text, "options": ["A", "B", "C", "D"], "answer_index": 0}
+
+
+def test_split_respects_budget_and_order():
+    paragraphs = [f"Paragraph {i}. " + "word " * 40 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = chunking.split_into_chunks(text, max_tokens=100)
+    assert len(chunks) > 1
+    assert all(chunking.estimate_tokens(c) <= 100 for c in chunks)
+    # nothing lost or reordered
+    rejoined = " ".join(" ".join(chunks).split())
+    assert rejoined == " ".join(text.split())
+
+
+def test_split_handles_oversized_paragraph_and_small_text():
+    assert chunking.split_into_chunks("short", max_tokens=100) == ["short"]
+    assert chunking.split_into_chunks("   ", max_tokens=100) == []
+    long_para = "A sentence here. " * 200
+    chunks = chunking.split_into_chunks(long_para, max_tokens=50)
+    assert len(chunks) > 1
+    assert all(len(c) <= 50 * chunking.CHARS_PER_TOKEN for c in chunks)
+
+
+def test_spread_picks_evenly():
+    assert chunking.spread(list(range(10)), 5) == [0, 2, 4, 6, 8]
+    assert chunking.spread([1, 2], 5) == [1, 2]
+
+
+def test_merge_round_robin_and_dedupe():
+    per_chunk = [
+        [_q("Start one"), _q("Start two")],
+        [_q("Middle one"), _q("start ONE?")],
+        [_q("End one")],
+    ]
+    merged = chunking.merge_mcqs(per_chunk, 4)
+    assert [m["question"] for m in merged] == ["Start one", "Middle one", "End one", "Start two"]
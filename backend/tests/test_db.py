@@ -54,3 +54,201 @@ def test_concurrent_creates(tmp_path):
     # ensure all created documents are present
     for did in created:
         assert db.get_document(did) is not None
+
+
+def test_concurrent_creates_of_the_same_body(tmp_path):
+    db_path = tmp_path / "same_body.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    barrier = threading.Barrier(8)
+
+    def worker(i):
+        barrier.wait()
+        db.create_document(f"d{i}", "same.txt", "/u/same", None, "same text", content_hash="txt:same")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(db.get_document_text(f"d{i}") == "same text" for i in range(8))
+    assert db.get_conn().execute("SELECT COUNT(*) FROM document_bodies").fetchone()[0] == 1
+
+
+def test_job_lifecycle_and_stale_reclaim(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    db.create_job("job-1", "doc-1", 3)
+    claimed = db.claim_next_job()
+    assert claimed["id"] == "job-1"
+    assert claimed["status"] == "running"
+    # a running job inside its lease is not handed out twice
+    assert db.claim_next_job() is None
+    # ...but is picked up again once the lease expired (e.g. after a restart)
+    assert db.claim_next_job(lease_seconds=-1)["id"] == "job-1"
+
+    db.finish_job("job-1", {"mcqs": [1, 2, 3]})
+    done = db.get_job("job-1")
+    assert done["status"] == "done"
+    assert done["result"] == {"mcqs": [1, 2, 3]}
+
+
+def test_job_lease_renewal_and_attempt_limit(tmp_path):
+    db_path = tmp_path / "job_attempts.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    db.create_job("job-1", "doc-1", 3)
+    db.create_job("job-2", "doc-1", 3)
+    assert db.claim_next_job(max_attempts=2)["id"] == "job-1"
+    # a renewed lease keeps the job from being claimed again
+    db.renew_job_lease("job-1")
+    assert db.claim_next_job(lease_seconds=60, max_attempts=2)["id"] == "job-2"
+    assert db.claim_next_job(lease_seconds=60, max_attempts=2) is None
+    # an expired lease is retried until the attempts run out
+    assert db.claim_next_job(lease_seconds=-1, max_attempts=2)["id"] == "job-1"
+    assert db.claim_next_job(lease_seconds=-1, max_attempts=2)["id"] == "job-2"
+    assert db.claim_next_job(lease_seconds=-1, max_attempts=2) is None
+    failed = db.get_job("job-1")
+    assert failed["status"] == "failed" and failed["error"] == "gave up after 2 attempts"
+    assert db.get_job("job-2")["status"] == "failed"
+
+
+def test_full_text_search_ranks_and_snippets(tmp_path):
+    db_path = tmp_path / "fts.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    db.create_document("d1", "biology.txt", "/u/1", "/e/1", "Cells divide by mitosis. " + "Filler text. " * 50)
+    db.create_document("d2", "notes.txt", "/u/2", "/e/2", "Mitosis and meiosis. Mitosis again, mitosis everywhere.")
+    db.create_document("d3", "history.txt", "/u/3", "/e/3", "The Roman empire.")
+
+    found = db.list_documents(q="mitosis")
+    assert [d["id"] for d in found] == ["d2", "d1"]
+    assert "mitosis" in found[1]["snippet"].lower()
+    # prefix matching and filename matching
+    assert [d["id"] for d in db.list_documents(q="mito")] == ["d2", "d1"]
+    assert [d["id"] for d in db.list_documents(q="history")] == ["d3"]
+    # FTS syntax in user input is treated as plain text
+    assert [d["id"] for d in db.list_documents(q='"mitosis (')] == ["d2", "d1"]
+    assert db.list_documents(q="***") == []
+
+
+def test_fts_backfills_existing_rows(tmp_path):
+    import sqlite3
+
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, filename TEXT, upload_path TEXT, extracted_path TEXT, text TEXT, uploaded_at TEXT)")
+    conn.execute("INSERT INTO documents VALUES ('old', 'old.txt', '/u', '/e', 'photosynthesis in plants', '2020-01-01T00:00:00')")
+    conn.commit()
+    conn.close()
+
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+    assert [d["id"] for d in db.list_documents(q="photosynthesis")] == ["old"]
+
+
+def test_pooled_connections_use_wal_and_are_reused(tmp_path):
+    db_path = tmp_path / "pool.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    conn = db.get_conn()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+    # same thread -> same connection; other threads get their own
+    assert db.get_conn() is conn
+    other = []
+    t = threading.Thread(target=lambda: other.append(db.get_conn()))
+    t.start()
+    t.join()
+    assert other[0] is not conn
+
+    # a failing write is rolled back and leaves the connection usable
+    with pytest.raises(Exception):
+        with db.connection() as c:
+            c.execute("INSERT INTO jobs (id, status) VALUES ('x', 'queued')")
+            raise RuntimeError("boom")
+    assert db.get_job("x") is None
+    assert not conn.in_transaction
+
+    db.close_all()
+    db.create_job("after-close", "doc", 1)
+    assert db.get_job("after-close")["status"] == "queued"
+
+
+def test_keyset_pagination_matches_offset(tmp_path):
+    db_path = tmp_path / "pages.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    for i in range(25):
+        db.create_document(f"doc-{i:02d}", f"f{i}.txt", "/u", "/e", "text")
+    expected = [d["id"] for d in db.list_documents(limit=100)]
+
+    seen = []
+    cursor = None
+    while True:
+        page = db.list_documents(limit=10, cursor=cursor)
+        seen.extend(d["id"] for d in page)
+        if len(page) < 10:
+            break
+        cursor = db.encode_cursor(page[-1])
+    assert seen == expected
+    assert [d["id"] for d in db.list_documents(limit=10, offset=10)] == expected[10:20]
+
+    with pytest.raises(ValueError):
+        db.list_documents(cursor="not-a-cursor")
+
+
+def test_text_stored_once_compressed_and_loaded_lazily(tmp_path):
+    db_path = tmp_path / "bodies.db"
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+
+    text = "Repeated body text. " * 500
+    db.create_document("a", "a.txt", "/u/a", None, text, content_hash="h1")
+    db.create_document("b", "b.txt", "/u/a", None, text, content_hash="h1")
+
+    meta = db.get_document("a")
+    assert "text" not in meta
+    assert db.get_document_text("a") == text
+    assert db.get_document_text("b") == text
+    assert db.get_document_text("missing") is None
+
+    conn = db.get_conn()
+    # one shared, compressed body for both documents and nothing inline
+    bodies = conn.execute("SELECT id, length(body) FROM document_bodies").fetchall()
+    assert len(bodies) == 1 and bodies[0][1] < len(text) // 10
+    assert conn.execute("SELECT count(*) FROM documents WHERE text IS NOT NULL").fetchone()[0] == 0
+
+
+def test_inline_text_migrated_to_bodies(tmp_path):
+    import sqlite3
+
+    db_path = tmp_path / "inline.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, filename TEXT, upload_path TEXT, extracted_path TEXT, text TEXT, uploaded_at TEXT)")
+    conn.execute("INSERT INTO documents VALUES ('legacy', 'l.txt', '/u', '/e', 'legacy inline text', '2020-01-01T00:00:00')")
+    conn.commit()
+    conn.close()
+
+    os.environ["QUIZGEN_DB_PATH"] = str(db_path)
+    import importlib
+    importlib.reload(db)
+    assert db.get_document_text("legacy") == "legacy inline text"
+    assert db.get_conn().execute("SELECT text FROM documents WHERE id='legacy'").fetchone()[0] is None
+    assert [d["id"] for d in db.list_documents(q="inline")] == ["legacy"]
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import openai
+
+import dedup
+from main import call_openai_generate
+
+
+def _q(text):
+    return {"question": text, "options": ["A", "B", "C", "D"], "answer_index": 0}
+
+
+def test_near_duplicates_are_dropped_in_order():
+    items = [
+        _q("What is the main function of the mitochondria in a cell?"),
+        _q("What is the capital of France?"),
+        _q("What is the main function of the mitochondria in the cell?"),
+        _q("what is the capital of FRANCE"),
+        _q("Which organelle produces energy?"),
+    ]
+    kept = dedup.dedupe_mcqs(items, threshold=0.7)
+    assert [m["question"] for m in kept] == [items[0]["question"], items[1]["question"], items[4]["question"]]
+    # a threshold above 1 turns the check off
+    assert dedup.dedupe_mcqs(items, threshold=1.1) == items
+
+
+def test_signatures_do_not_depend_on_the_string_hash_seed():
+    question = "What is the main function of the mitochondria in a cell?"
+    code = f"import dedup; print(list(dedup.signature(dedup.shingles({question!r}))))"
+    outputs = set()
+    for seed in ("0", "40"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        out = subprocess.run([sys.executable, "-c", code], cwd=TEST_BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        outputs.add(out.strip())
+    assert outputs == {str(list(dedup.signature(dedup.shingles(question))))}
+
+
+def test_deduper_scales_to_many_distinct_questions():
+    deduper = dedup.Deduper(0.7)
+    questions = [f"Question number {i} asks about topic {i * 7919 % 1000} and detail {i}" for i in range(500)]
+    assert all(deduper.add(q) for q in questions)
+    assert not any(deduper.add(q.upper()) for q in questions[:50])
+    assert deduper.dropped == 50 and len(deduper) == 500
+
+
+class FakeResp:
+    def __init__(self, content: str):
+        class Message:
+            def __init__(self, c):
+                self.content = c
+
+        class Choice:
+            def __init__(self, c):
+                self.message = Message(c)
+
+        self.choices = [Choice(content)]
+
+
+def test_dropped_duplicates_are_refilled(monkeypatch):
+    first = [_q("What does the document say about rivers?"), _q("What does the document say about the rivers?"), _q("Who wrote it?")]
+    refill = [_q("Who wrote it"), _q("When was it written?")]
+    prompts = []
+    responses = iter([first, refill])
+
+    def fake_create(*args, **kwargs):
+        prompts.append(kwargs["messages"][-1]["content"])
+        return FakeResp(json.dumps(next(responses)))
+
+    monkeypatch.setattr(openai.ChatCompletion, "create", fake_create)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    out = call_openai_generate("some text", 3)
+    assert [m["question"] for m in out] == [
+        "What does the document say about rivers?", "Who wrote it?", "When was it written?",
+    ]
+    # the refill call asks for the missing question and lists the ones kept
+    assert "Generate 1 MCQs." in prompts[1] and "- Who wrote it?" in prompts[1]
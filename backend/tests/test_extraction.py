@@ -0,0 +1,76 @@
+import os
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import extraction
+from scripts.synthetic import make_pdf
+
+
+def _pdf(tmp_path, pages):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, pages, page_lines=[[f"Page {i} text."] for i in range(pages)])
+    return path
+
+
+def test_extract_to_file_records_page_offsets(tmp_path):
+    path = _pdf(tmp_path, 5)
+    out = str(tmp_path / "out.txt")
+    offsets = extraction.extract_to_file(path, "doc.pdf", out)
+    with open(out, encoding="utf-8", newline="") as f:
+        text = f.read()
+    assert text == extraction.extract_text(path, "doc.pdf")
+    assert len(offsets) == 5
+    bounds = offsets + [len(text) + 1]
+    pages = [text[bounds[i]:bounds[i + 1] - 1] for i in range(5)]
+    assert pages == [f"Page {i} text." for i in range(5)]
+
+
+def test_page_cap_and_cache_release(tmp_path, monkeypatch):
+    path = _pdf(tmp_path, 6)
+    closed = []
+    pdfplumber = extraction._pdfplumber()
+    original_close = pdfplumber.page.Page.close
+
+    def tracking_close(self):
+        closed.append(self.page_number)
+        original_close(self)
+
+    monkeypatch.setattr(pdfplumber.page.Page, "close", tracking_close)
+    pages = []
+    for text in extraction.iter_pdf_pages(path, max_pages=3):
+        # every earlier page has released its layout cache by now
+        assert closed[:len(pages)] == list(range(1, len(pages) + 1))
+        pages.append(text)
+    assert pages == [f"Page {i} text." for i in range(3)]
+
+
+def test_txt_is_a_single_page(tmp_path):
+    src = tmp_path / "a.txt"
+    src.write_text("line one\nline two", encoding="utf-8")
+    out = str(tmp_path / "out.txt")
+    assert extraction.extract_to_file(str(src), "a.txt", out) == [0]
+
+
+def test_parallel_pdf_matches_serial(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = _pdf(tmp_path, 11)
+    serial_out, parallel_out = str(tmp_path / "serial.txt"), str(tmp_path / "parallel.txt")
+    serial_offsets = extraction.extract_to_file(path, "doc.pdf", serial_out)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        parallel_offsets = extraction.extract_pdf_parallel(path, parallel_out, pool, parts=4)
+        capped = extraction.extract_pdf_parallel(path, str(tmp_path / "capped.txt"), pool, parts=4, max_pages=5)
+    assert parallel_offsets == serial_offsets
+    with open(serial_out, encoding="utf-8", newline="") as a, open(parallel_out, encoding="utf-8", newline="") as b:
+        assert a.read() == b.read()
+    assert capped == serial_offsets[:5]
+    # per-range part files are cleaned up
+    assert sorted(os.listdir(tmp_path)) == ["capped.txt", "doc.pdf", "parallel.txt", "serial.txt"]
+
+
+def test_split_page_range():
+    assert extraction.split_page_range(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert extraction.split_page_range(2, 8) == [(0, 1), (1, 2)]
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sqlite3
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import db
+import jobs
+
+
+async def _wait_for(predicate, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def test_worker_survives_database_errors(fresh_db, monkeypatch, caplog):
+    claim = db.claim_next_job
+    outages = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_claim(*args, **kwargs):
+        if outages:
+            raise outages.pop()
+        return claim(*args, **kwargs)
+
+    monkeypatch.setattr(db, "claim_next_job", flaky_claim)
+    monkeypatch.setattr(jobs, "JOB_WORKERS", 1)
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(jobs, "_MAX_BACKOFF", 0.01)
+
+    async def handler(job):
+        return {"mcqs": [job["num_questions"]]}
+
+    async def _run():
+        db.create_job("job-1", "doc-1", 2)
+        jobs.start_workers(handler)
+        try:
+            await _wait_for(lambda: db.get_job("job-1")["status"] == "done")
+        finally:
+            await jobs.stop_workers()
+
+    asyncio.run(_run())
+    assert db.get_job("job-1")["result"] == {"mcqs": [2]}
+    assert any("job worker failed" in r.getMessage() for r in caplog.records)
+
+
+def test_long_job_renews_its_lease(fresh_db, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WORKERS", 1)
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 0.15)
+    runs = []
+
+    async def handler(job):
+        runs.append(job["id"])
+        # outlives the lease several times over
+        await asyncio.sleep(0.6)
+        return {"mcqs": []}
+
+    async def _run():
+        db.create_job("job-1", "doc-1", 1)
+        jobs.start_workers(handler)
+        try:
+            await _wait_for(lambda: runs)
+            for _ in range(10):
+                await asyncio.sleep(0.05)
+                # nobody else may take over the job while it is being worked on
+                assert await asyncio.to_thread(db.claim_next_job, jobs.JOB_LEASE_SECONDS) is None
+            await _wait_for(lambda: db.get_job("job-1")["status"] == "done")
+        finally:
+            await jobs.stop_workers()
+
+    asyncio.run(_run())
+    assert runs == ["job-1"]
@@ -0,0 +1,53 @@
+import os
+import sys
+import threading
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import metrics
+
+
+def test_histogram_buckets_are_cumulative_and_summed_across_threads():
+    h = metrics.Histogram("test_latency_seconds", "Test histogram.", ("op",), buckets=(0.1, 1.0), registry=[])
+
+    def work():
+        for v in (0.05, 0.5, 5.0):
+            h.observe(v, "read")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    h.observe(0.1, 'we"ird')
+    lines = h.render()
+    pid = f'pid="{os.getpid()}"'
+    assert "# TYPE test_latency_seconds histogram" in lines
+    assert f'test_latency_seconds_bucket{{op="read",{pid},le="0.1"}} 4' in lines
+    assert f'test_latency_seconds_bucket{{op="read",{pid},le="1"}} 8' in lines
+    assert f'test_latency_seconds_bucket{{op="read",{pid},le="+Inf"}} 12' in lines
+    assert f'test_latency_seconds_count{{op="read",{pid}}} 12' in lines
+    assert f'test_latency_seconds_sum{{op="read",{pid}}} 22.2' in lines
+    # bucket bounds are inclusive and label values are escaped
+    assert f'test_latency_seconds_bucket{{op="we\\"ird",{pid},le="0.1"}} 1' in lines
+    assert h.count("read") == 12
+
+
+def test_counter_and_render():
+    registry = []
+    c = metrics.Counter("test_events_total", "Test counter.", ("kind",), registry=registry)
+    c.inc("a")
+    c.inc("a", amount=2)
+    c.inc("b")
+    assert c.value("a") == 3
+    text = metrics.render(registry)
+    pid = os.getpid()
+    assert text.startswith("# HELP test_events_total Test counter.\n# TYPE test_events_total counter\n")
+    assert f'test_events_total{{kind="a",pid="{pid}"}} 3\n' in text
+    assert f'test_events_total{{kind="b",pid="{pid}"}} 1\n' in text
+    # scoped registries stay out of the application's metrics
+    app_text = metrics.render()
+    assert "# TYPE quizgen_db_call_seconds histogram" in app_text
+    assert "test_events_total" not in app_text
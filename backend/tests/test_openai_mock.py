@@ -101,3 +101,73 @@ def test_openai_invalid_item_then_recovery(monkeypatch):
     assert isinstance(out, list)
     assert len(out) == 1
     assert out[0]["question"] == "Fixed"
+
+
+def test_async_calls_respect_concurrency_limit(monkeypatch):
+    import asyncio
+    import main
+
+    valid = [{"question": "C1", "options": ["A", "B", "C", "D"], "answer_index": 0}]
+    state = {"inflight": 0, "peak": 0}
+
+    async def fake_acreate(*args, **kwargs):
+        state["inflight"] += 1
+        state["peak"] = max(state["peak"], state["inflight"])
+        await asyncio.sleep(0.05)
+        state["inflight"] -= 1
+        return FakeResp(json.dumps(valid))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake_acreate)
+    monkeypatch.setattr(main, "_llm_scheduler", main.scheduler.LLMScheduler(2))
+    os.environ["OPENAI_API_KEY"] = "test"
+
+    async def _run():
+        return await asyncio.gather(*(main.call_openai_generate_async("doc", 1) for _ in range(6)))
+
+    results = asyncio.run(_run())
+    assert all(r[0]["question"] == "C1" for r in results)
+    assert state["peak"] == 2
+
+
+def test_async_call_timeout_falls_back(monkeypatch):
+    import asyncio
+    import main
+
+    async def slow_acreate(*args, **kwargs):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", slow_acreate)
+    monkeypatch.setattr(main, "_LLM_TIMEOUT", 0.01)
+    monkeypatch.setattr(main, "_LLM_BACKOFF", 0.0)
+    os.environ["OPENAI_API_KEY"] = "test"
+
+    out = asyncio.run(main.call_openai_generate_async("First sentence. Second sentence.", 2))
+    assert len(out) == 2
+    assert out[0]["question"] == "What is the main idea of: First sentence?"
+
+
+def test_large_document_generated_per_chunk(monkeypatch):
+    import main
+
+    prompts = []
+
+    def fake_create(*args, **kwargs):
+        user = kwargs["messages"][1]["content"]
+        prompts.append(user)
+        # question names the section it came from
+        section = user.split("Section ")[1].split(" ")[0]
+        return FakeResp(json.dumps([
+            {"question": f"About section {section} #{i}", "options": ["A", "B", "C", "D"], "answer_index": 0}
+            for i in range(3)
+        ]))
+
+    monkeypatch.setattr(openai.ChatCompletion, "create", fake_create)
+    monkeypatch.setattr(main, "_CHUNK_TOKENS", 60)
+    os.environ["OPENAI_API_KEY"] = "test"
+    text = "\n\n".join(f"Section {i} " + "filler " * 30 for i in range(6))
+
+    out = call_openai_generate(text, 6)
+    assert len(prompts) == 6
+    assert len(out) == 6
+    # one question per section rather than all from the start of the document
+    assert sorted(q["question"].split()[2] for q in out) == [str(i) for i in range(6)]
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import pregen
+import scheduler
+
+
+def _pregenerator(sched, gate, started, settle_timeout):
+    async def handler(doc_id, n):
+        async with sched.slot(10):
+            started.set()
+            await gate.wait()
+
+    return pregen.Pregenerator(handler, enabled=True, questions=1, tenants={}, settle_timeout=settle_timeout)
+
+
+def test_settle_cancels_pregeneration_still_queued_for_the_llm():
+    async def _run():
+        sched = scheduler.LLMScheduler(1)
+        gate, started = asyncio.Event(), asyncio.Event()
+        p = _pregenerator(sched, gate, started, settle_timeout=5)
+        # an interactive call holds the only slot, so the background call queues behind it
+        await sched.acquire(10)
+        assert p.submit("d1", "t")
+        await asyncio.sleep(0.05)
+        assert p.running("d1") and not started.is_set()
+        await asyncio.wait_for(p.settle("d1"), 1)
+        assert p.pending() == 0 and not started.is_set()
+        sched.release()
+        assert not sched._background and sched._inflight == 0
+
+    asyncio.run(_run())
+
+
+def test_settle_waits_a_bounded_time_for_pregeneration_calling_the_llm():
+    async def _run():
+        sched = scheduler.LLMScheduler(2)
+        gate, started = asyncio.Event(), asyncio.Event()
+        p = _pregenerator(sched, gate, started, settle_timeout=0.05)
+        assert p.submit("d1", "t")
+        await asyncio.wait_for(started.wait(), 1)
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        await p.settle("d1")
+        assert 0.04 <= loop.time() - begin < 1
+        # the task is left to finish and bank its questions
+        assert p.pending() == 1
+        gate.set()
+        await asyncio.sleep(0.01)
+        assert p.pending() == 0
+
+    asyncio.run(_run())
+
+
+def test_failed_pregeneration_is_logged(caplog):
+    async def handler(doc_id, n):
+        raise RuntimeError("LLM generation failed")
+
+    async def _run():
+        p = pregen.Pregenerator(handler, enabled=True, questions=1, tenants={})
+        assert p.submit("d1", "t")
+        await asyncio.sleep(0.01)
+        assert p.pending() == 0
+
+    asyncio.run(_run())
+    record = next(r for r in caplog.records if r.name == "pregen")
+    assert "d1" in record.getMessage() and record.exc_info[0] is RuntimeError
+
+
+def test_submissions_beyond_the_queue_limit_are_dropped():
+    async def _run():
+        gate = asyncio.Event()
+
+        async def handler(doc_id, n):
+            await gate.wait()
+
+        p = pregen.Pregenerator(handler, enabled=True, questions=1, tenants={}, concurrency=1, queue_max=2)
+        assert p.submit("d0", "t")
+        await asyncio.sleep(0.01)
+        assert p.running("d0")
+        # one running, two waiting: the fourth is refused
+        assert p.submit("d1", "t") and p.submit("d2", "t")
+        assert not p.submit("d3", "t")
+        assert p.pending() == 3
+        gate.set()
+        await asyncio.sleep(0.01)
+        assert p.pending() == 0 and p.submit("d3", "t")
+        await p.shutdown()
+
+    asyncio.run(_run())
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import scheduler
+from scheduler import LLMScheduler
+
+
+def _run_calls(sched, calls, hold=0.01):
+    """Start `calls` [(tenant, tokens)] in order; return the tenants in the order they got a slot."""
+    order = []
+
+    async def one(tenant, tokens):
+        async with sched.slot(tokens, tenant):
+            order.append(tenant)
+            await asyncio.sleep(hold)
+
+    async def main():
+        await asyncio.gather(*(one(t, n) for t, n in calls))
+
+    asyncio.run(main())
+    return order
+
+
+def test_round_robin_keeps_heavy_tenant_from_starving_others():
+    sched = LLMScheduler(1)
+    order = _run_calls(sched, [("heavy", 100)] * 6 + [("light", 10)] * 2)
+    # the light tenant is served after one heavy call, not after all six
+    assert order[:5] == ["heavy", "heavy", "light", "heavy", "light"]
+    assert scheduler.parse_weights("a=3, b=2,bad,c=x") == {"a": 3, "b": 2}
+
+
+def test_weights_give_proportional_turns():
+    sched = LLMScheduler(1, weights={"big": 2})
+    order = _run_calls(sched, [("big", 1)] * 5 + [("small", 1)] * 3)
+    # the first call starts at once; queued calls then go two "big" per "small"
+    assert order == ["big", "big", "big", "small", "big", "big", "small", "small"]
+
+
+def test_tenant_budget_delays_only_that_tenant():
+    # 600 tokens/min = 10/s: "a" spends its budget, then waits ~0.5s for 5 more
+    sched = LLMScheduler(4, tokens_per_min=600)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        done = {}
+
+        async def one(name, tenant, tokens):
+            async with sched.slot(tokens, tenant):
+                done[name] = loop.time() - start
+
+        await asyncio.gather(one("a1", "a", 600), one("a2", "a", 5), one("b1", "b", 50))
+        return done
+
+    done = asyncio.run(main())
+    assert done["a1"] < 0.1 and done["b1"] < 0.1
+    assert 0.4 < done["a2"] < 1.5
+    stats = sched.stats()
+    assert stats["a"]["tokens_charged"] == 605 and stats["a"]["calls"] == 2
+    assert stats["a"]["max_queue_wait_seconds"] > 0.4
+    assert stats["b"]["max_queue_wait_seconds"] < 0.1
+    assert sched.stats("nobody")["calls"] == 0
+
+
+def test_cancelled_waiter_frees_its_place():
+    sched = LLMScheduler(1)
+
+    async def main():
+        async with sched.slot(1, "a"):
+            waiter = asyncio.create_task(sched.acquire(1, "b"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        # the slot is free again and nobody is queued
+        await asyncio.wait_for(sched.acquire(1, "c"), 1)
+        sched.release()
+        return sched.stats()
+
+    stats = asyncio.run(main())
+    assert "b" not in stats and stats["c"]["queued"] == 0
+
+
+def test_background_calls_yield_to_interactive_ones():
+    sched = LLMScheduler(3)
+    order = []
+    peak = {"background": 0, "inflight": 0}
+    running = {"background": 0}
+
+    async def one(name, low, hold):
+        token = scheduler.background.set(low)
+        try:
+            async with sched.slot(1, "t"):
+                order.append(name)
+                if low:
+                    running["background"] += 1
+                    peak["background"] = max(peak["background"], running["background"])
+                peak["inflight"] = max(peak["inflight"], sched._inflight)
+                await asyncio.sleep(hold)
+                if low:
+                    running["background"] -= 1
+        finally:
+            scheduler.background.reset(token)
+
+    async def main():
+        tasks = [asyncio.create_task(one(f"bg{i}", True, 0.02)) for i in range(4)]
+        await asyncio.sleep(0)
+        # background work already holds two slots; interactive calls queue for the rest
+        tasks += [asyncio.create_task(one(f"fg{i}", False, 0.01)) for i in range(3)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    # one slot stays free for interactive calls, and queued interactive calls go first
+    assert peak["background"] == 2
+    assert order[:2] == ["bg0", "bg1"]
+    assert order.index("fg2") < order.index("bg2")
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sqlite3
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+import chunking
+import db
+import segmentation
+
+
+PAGES = ["First page. It has two sentences.", "Para one on page two!\n\nPara two? Yes.", "Last page"]
+
+
+def _pdf_like():
+    text = "\n".join(PAGES)
+    offsets, pos = [], 0
+    for page in PAGES:
+        offsets.append(pos)
+        pos += len(page) + 1
+    return text, offsets
+
+
+def test_segment_page_spans():
+    text, offsets = _pdf_like()
+    bounds = segmentation.page_bounds(text, offsets)
+    assert [text[s:e] for s, e in bounds] == PAGES
+    rows = segmentation.segment_page(text, *bounds[1], 1)
+    by_kind = {}
+    for kind, start, end, tokens, page in rows:
+        assert page == 1 and tokens == chunking.estimate_tokens(text[start:end])
+        by_kind.setdefault(kind, []).append(text[start:end])
+    assert by_kind == {
+        "page": [PAGES[1]],
+        "paragraph": ["Para one on page two!", "Para two? Yes."],
+        "sentence": ["Para one on page two!", "Para two?", "Yes."],
+    }
+
+
+def test_segment_body_is_batched_resumable_and_idempotent(fresh_db, monkeypatch):
+    text, offsets = _pdf_like()
+    db.create_document("d1", "f.pdf", "/tmp/f.pdf", None, text, content_hash="h1", page_offsets=offsets)
+    db.create_document("d2", "copy.pdf", "/tmp/f.pdf", None, text, content_hash="h1")
+    assert db.get_segments("d1", "sentence", segmentation.SEGMENT_VERSION) is None
+    assert db.bodies_needing_segments(segmentation.SEGMENT_VERSION) == ["h1"]
+
+    # interrupted after the first batch: progress is saved, segments are not served yet
+    db.store_segments("h1", segmentation.segment_page(text, 0, len(PAGES[0]), 0), segmentation.SEGMENT_VERSION, 1, complete=False, restart=True)
+    assert db.get_segment_progress("h1") == {"version": segmentation.SEGMENT_VERSION, "next_page": 1, "complete": False}
+    assert db.get_segments("d1", "page", segmentation.SEGMENT_VERSION) is None
+
+    assert segmentation.backfill() == 1
+    assert not segmentation.segment_body("h1")
+    assert db.bodies_needing_segments(segmentation.SEGMENT_VERSION) == []
+    sentences = db.get_segments("d1", "sentence", segmentation.SEGMENT_VERSION)
+    assert [text[s:e] for s, e, _ in sentences] == [
+        "First page.", "It has two sentences.", "Para one on page two!", "Para two?", "Yes.", "Last page",
+    ]
+    # deduplicated documents share the body's segments
+    assert db.get_segments("d2", "sentence", segmentation.SEGMENT_VERSION, limit=2) == sentences[:2]
+
+    # a new segmentation version redoes the body from scratch, in small batches
+    monkeypatch.setattr(segmentation, "SEGMENT_VERSION", segmentation.SEGMENT_VERSION + 1)
+    assert db.get_segments("d1", "sentence", segmentation.SEGMENT_VERSION) is None
+    assert segmentation.segment_body("h1", batch_pages=1)
+    assert db.get_segments("d1", "sentence", segmentation.SEGMENT_VERSION) == sentences
+    count = db.get_conn().execute("SELECT COUNT(*) FROM segments WHERE body_id='h1' AND kind='page'").fetchone()[0]
+    assert count == len(PAGES)
+
+
+def test_pack_spans_respects_token_budget():
+    paragraphs = [("word " * 30).strip() for _ in range(10)] + ["x. " * 200]
+    text = "\n\n".join(paragraphs)
+    spans = segmentation.paragraph_spans(text, 0, len(text))
+    spans = [(s, e, chunking.estimate_tokens(text[s:e])) for s, e in spans]
+    chunks = chunking.pack_spans(text, spans, 100)
+    assert len(chunks) > 1
+    assert all(chunking.estimate_tokens(c) <= 100 + 2 for c in chunks)
+    assert "".join(chunks).replace("\n", "").replace(" ", "") == text.replace("\n", "").replace(" ", "")
+
+
+def test_upload_segments_and_dummy_questions_use_them(app_storage, monkeypatch):
+    import io
+    from httpx import ASGITransport, AsyncClient
+    import main
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    content = "Alpha is first. Beta follows alpha!\n\nGamma closes the list. Delta is extra."
+
+    async def _run():
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as ac:
+            up = await ac.post("/upload", files={"file": ("seg.txt", io.BytesIO(content.encode()), "text/plain")})
+            assert up.status_code == 200
+            assert "segment;dur=" in up.headers["Server-Timing"]
+            doc_id = up.json()["doc_id"]
+            assert len(db.get_segments(doc_id, "sentence", segmentation.SEGMENT_VERSION)) == 4
+            gen = await ac.post("/generate?fresh=1", json={"doc_id": doc_id, "num_questions": 3})
+            return gen.json()["mcqs"]
+
+    mcqs = asyncio.run(_run())
+    assert [m["options"][0] for m in mcqs] == ["Alpha is first", "Beta follows alpha!", "Gamma closes the list"]
+
+
+def test_backfill_skips_failing_bodies_and_backs_off_on_errors(fresh_db, monkeypatch, caplog):
+    import main
+
+    for i in range(3):
+        db.create_document(f"d{i}", "f.txt", "/tmp/f.txt", None, f"Body {i}. Text.", content_hash=f"h{i}")
+    segment_body = segmentation.segment_body
+
+    def flaky_segment_body(body_id, *args, **kwargs):
+        if body_id == "h1":
+            raise ValueError("bad body")
+        return segment_body(body_id, *args, **kwargs)
+
+    monkeypatch.setattr(segmentation, "segment_body", flaky_segment_body)
+    bodies_needing_segments = db.bodies_needing_segments
+    outages = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_bodies(*args, **kwargs):
+        if outages:
+            raise outages.pop()
+        return bodies_needing_segments(*args, **kwargs)
+
+    monkeypatch.setattr(db, "bodies_needing_segments", flaky_bodies)
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(main.asyncio, "sleep", fake_sleep)
+    # a database error backs off and retries; a failing body is logged and skipped,
+    # and the task still finishes
+    asyncio.run(asyncio.wait_for(main._backfill_segments(), 5))
+    assert sleeps == [1.0]
+    assert db.bodies_needing_segments(segmentation.SEGMENT_VERSION) == ["h1"]
+    assert any("h1" in r.getMessage() and r.exc_info for r in caplog.records)
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+
+SCRIPT = textwrap.dedent(
+    """
+    import asyncio, os, sys
+    import main
+
+    # importing the app touches neither the heavy libraries nor the disk
+    assert not {"pdfplumber", "docx", "openai"} & set(sys.modules), sys.modules.keys()
+    assert not os.path.exists(os.environ["QUIZGEN_DB_PATH"])
+    assert not os.path.exists(os.environ["QUIZGEN_STORAGE_DIR"])
+
+    async def run():
+        async with main.lifespan(main.app):
+            assert os.path.exists(os.environ["QUIZGEN_DB_PATH"])
+            assert os.path.isdir(main.UPLOAD_DIR) and os.path.isdir(main.EXTRACTED_DIR)
+            for _ in range(200):
+                if {"pdfplumber", "docx", "openai"} <= set(sys.modules):
+                    break
+                await asyncio.sleep(0.05)
+            else:
+                raise AssertionError("warm-up did not load the parsers")
+
+    asyncio.run(run())
+    print("ok")
+    """
+)
+
+
+def test_import_is_lazy_and_lifespan_sets_up(tmp_path):
+    env = dict(
+        os.environ,
+        QUIZGEN_DB_PATH=str(tmp_path / "db" / "startup.db"),
+        QUIZGEN_STORAGE_DIR=str(tmp_path / "storage"),
+        STARTUP_WARMUP="1",
+        EXTRACT_WORKERS="0",
+    )
+    out = subprocess.run([sys.executable, "-c", SCRIPT], cwd=TEST_BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().endswith("ok")
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+TEST_BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+if TEST_BACKEND_DIR not in sys.path:
+    sys.path.insert(0, TEST_BACKEND_DIR)
+
+from streaming import MCQStreamParser, sse_event
+
+
+def test_parser_emits_objects_as_they_complete():
+    items = [
+        {"question": 'Tricky "quote" and {brace}', "options": ["A", "B", "C", "D"], "answer_index": 0},
+        {"question": "Second", "options": ["A", "B", "C", "D"], "answer_index": 3},
+    ]
+    payload = "Here you go:\n" + json.dumps(items)
+    parser = MCQStreamParser()
+    seen = []
+    first_done_at = None
+    for i in range(0, len(payload), 5):
+        seen.extend(parser.feed(payload[i:i + 5]))
+        if seen and first_done_at is None:
+            first_done_at = i
+    assert seen == items
+    # the first object is available before the whole array has arrived
+    assert first_done_at < len(payload) - len(json.dumps(items[1]))
+
+
+def test_parser_skips_malformed_object():
+    parser = MCQStreamParser()
+    out = parser.feed('[{"question": oops}, {"question": "ok"}]')
+    assert out == [{"question": "ok"}]
+
+
+def test_sse_event_format():
+    assert sse_event("done", {"count": 1}) == 'event: done\ndata: {"count": 1}\n\n'